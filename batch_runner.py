@@ -0,0 +1,421 @@
+"""
+Plays tournaments through a provider's asynchronous batch API.
+
+Batch endpoints are cheaper and have higher throughput than live calls, but
+each batch can take minutes or hours to complete. Turns within a match are
+sequential, so instead of playing one match at a time, every active match
+advances by one turn per batch round: the next-turn prompts of all LLM
+players are submitted together, the batch is polled until it completes, and
+the moves are applied before the next round is built.
+
+The progress of every match is saved to a state file after each round, along
+with the id of any batch in flight, so a run that takes many hours survives
+restarts and picks up its outstanding batch instead of resubmitting it.
+Requests and random seeds are derived from each match's key (its players'
+names and repetition), not its position, so they stay the same when a
+resumed run is given fewer matches.
+"""
+import abc
+import hashlib
+import json
+import os
+import pathlib
+import time
+from typing import Any
+
+import axelrod as axl
+import numpy as np
+from axelrod.match import sample_length
+
+from llm_player import LLMPlayer, litellm
+
+# Batch statuses after which no further progress is made.
+FAILED_STATUSES = {"failed", "expired", "cancelled"}
+
+
+class BatchClient(abc.ABC):
+    """
+    The interface to a provider's batch API.
+
+    Requests are keyed by a custom id, which is echoed back with each result.
+    Each request is a dict of `litellm.completion` arguments (`model`,
+    `messages`, `response_model` and any extra keyword arguments).
+    """
+
+    @abc.abstractmethod
+    def submit(self, requests: dict[str, dict[str, Any]]) -> str:
+        """Submits a batch of requests and returns the batch id."""
+
+    @abc.abstractmethod
+    def status(self, batch_id: str) -> str:
+        """Returns the status of a batch, `"completed"` once it's done."""
+
+    @abc.abstractmethod
+    def results(self, batch_id: str) -> dict[str, str | None]:
+        """
+        Returns the response content of each request in a completed batch.
+        Requests that failed map to None.
+        """
+
+
+class LiteLLMBatchClient(BatchClient):
+    """
+    A batch client for the OpenAI-style files and batches API, through
+    litellm.
+    """
+
+    def __init__(self, custom_llm_provider: str = "openai", **kwargs: Any):
+        """
+        Args:
+            custom_llm_provider: The litellm provider that runs the batches.
+            **kwargs: Additional keyword arguments (such as `api_key`) to pass
+                      to litellm's file and batch functions.
+        """
+        self.custom_llm_provider = custom_llm_provider
+        self.kwargs = kwargs
+
+    def _body(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Converts `litellm.completion` arguments to a request body."""
+        request = dict(request)
+        response_model = request.pop("response_model", None)
+        request.pop("api_key", None)
+        model, _, _, _ = litellm.get_llm_provider(request.pop("model"))
+        body = {"model": model, **request}
+        if response_model is not None:
+            body["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": response_model.__name__,
+                    "schema": response_model.model_json_schema(),
+                },
+            }
+        return body
+
+    def submit(self, requests: dict[str, dict[str, Any]]) -> str:
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self._body(request),
+                }
+            )
+            for custom_id, request in requests.items()
+        ]
+        batch_file = litellm.create_file(
+            file=("batch.jsonl", "\n".join(lines).encode()),
+            purpose="batch",
+            custom_llm_provider=self.custom_llm_provider,
+            **self.kwargs,
+        )
+        batch = litellm.create_batch(
+            completion_window="24h",
+            endpoint="/v1/chat/completions",
+            input_file_id=batch_file.id,
+            custom_llm_provider=self.custom_llm_provider,
+            **self.kwargs,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self._retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> dict[str, str | None]:
+        batch = self._retrieve(batch_id)
+        results = {}
+        # Failed requests are written to a separate error file, and a batch
+        # in which every request failed completes without an output file.
+        for file_id in (batch.output_file_id, getattr(batch, "error_file_id", None)):
+            if file_id:
+                for custom_id, content in self._read(file_id).items():
+                    results.setdefault(custom_id, content)
+        return results
+
+    def _read(self, file_id: str) -> dict[str, str | None]:
+        """Returns the response content of each record in a batch file."""
+        content = litellm.file_content(
+            file_id=file_id,
+            custom_llm_provider=self.custom_llm_provider,
+            **self.kwargs,
+        )
+        results = {}
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            try:
+                message = response["body"]["choices"][0]["message"]
+                results[record["custom_id"]] = message["content"]
+            except (KeyError, IndexError, TypeError):
+                results[record["custom_id"]] = None
+        return results
+
+    def _retrieve(self, batch_id: str) -> Any:
+        return litellm.retrieve_batch(
+            batch_id=batch_id,
+            custom_llm_provider=self.custom_llm_provider,
+            **self.kwargs,
+        )
+
+
+def _match_id(key: tuple[str, str, int]) -> str:
+    """Returns a short id for a match that depends only on its key."""
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()[:16]
+
+
+def _seed(seed: int | None, *keys: int) -> int | None:
+    """Derives an independent seed for a match or turn from the run's seed."""
+    if seed is None:
+        return None
+    return int(np.random.SeedSequence([seed, *keys]).generate_state(1)[0])
+
+
+class _MatchState:
+    """The players and progress of one match in a batch tournament."""
+
+    def __init__(
+        self,
+        match_id: str,
+        player1: axl.Player,
+        player2: axl.Player,
+        repetition: int,
+        turns: int,
+        noise: float,
+        length: float,
+        seed: int | None,
+    ):
+        self.match_id = match_id
+        self.repetition = repetition
+        self.turns = turns
+        self.noise = noise
+        self.seed = seed
+        self.players = (player1.clone(), player2.clone())
+        for i, player in enumerate(self.players):
+            player.reset()
+            player.set_match_attributes(length=length, noise=noise)
+            if seed is not None and axl.Classifiers["stochastic"](player):
+                player.set_seed(_seed(seed, i))
+
+    @property
+    def key(self) -> tuple[str, str, int]:
+        return (self.players[0].name, self.players[1].name, self.repetition)
+
+    @property
+    def done(self) -> bool:
+        return len(self.players[0].history) >= self.turns
+
+    def replay(self, moves: list[str]) -> None:
+        """
+        Restores the match from its recorded moves.
+
+        Strategies that aren't LLM players are asked for each move again, so
+        that any internal state they keep is rebuilt, but the recorded moves
+        are what goes into the histories.
+        """
+        for pair in moves:
+            for player, opponent in self._sides():
+                if not isinstance(player, LLMPlayer):
+                    player.strategy(opponent)
+            self._update(axl.Action.from_char(pair[0]), axl.Action.from_char(pair[1]))
+
+    def requests(self) -> dict[str, dict[str, Any]]:
+        """Returns the batch requests for the LLM players' next moves."""
+        requests = {}
+        turn = len(self.players[0].history)
+        for i, (player, opponent) in enumerate(self._sides()):
+            if isinstance(player, LLMPlayer):
+                prompt = player._generate_prompt(opponent)
+                requests[f"{self.match_id}-{turn}-{i}"] = {
+                    "model": player.model,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "response_model": player.response_model,
+                    "api_key": player.api_key,
+                    **player.litellm_kwargs,
+                }
+        return requests
+
+    def play_turn(self, results: dict[str, str | None]) -> None:
+        """Plays the next turn, taking LLM players' moves from `results`."""
+        turn = len(self.players[0].history)
+        actions = []
+        for i, (player, opponent) in enumerate(self._sides()):
+            if isinstance(player, LLMPlayer):
+                content = results.get(f"{self.match_id}-{turn}-{i}")
+                actions.append(player._move_from_content(content))
+            else:
+                actions.append(player.strategy(opponent))
+        if self.noise:
+            rng = axl.RandomGenerator(seed=_seed(self.seed, 2, turn))
+            actions = [rng.random_flip(action, self.noise) for action in actions]
+        self._update(*actions)
+
+    def moves(self) -> list[str]:
+        return [
+            f"{a}{b}"
+            for a, b in zip(
+                self.players[0].history, self.players[1].history, strict=True
+            )
+        ]
+
+    def result(self) -> dict[str, Any]:
+        """Returns the row for the results file of a finished match."""
+        game = axl.Game()
+        scores = [0, 0]
+        for a, b in zip(self.players[0].history, self.players[1].history, strict=True):
+            s1, s2 = game.score((a, b))
+            scores[0] += s1
+            scores[1] += s2
+        return {
+            "player1": self.players[0].name,
+            "player2": self.players[1].name,
+            "repetition": self.repetition,
+            "player1_score": scores[0] / self.turns,
+            "player2_score": scores[1] / self.turns,
+        }
+
+    def _sides(self) -> tuple[tuple[axl.Player, axl.Player], ...]:
+        player1, player2 = self.players
+        return ((player1, player2), (player2, player1))
+
+    def _update(self, action1: axl.Action, action2: axl.Action) -> None:
+        self.players[0].update_history(action1, action2)
+        self.players[1].update_history(action2, action1)
+
+
+class BatchTournament:
+    """
+    Plays a set of matches together, one turn per batch round.
+
+    Matches are described by `(player1, player2, repetition)` tuples, such as
+    the keys of the planner's work units. The same strategies and settings
+    must be given when resuming from a state file.
+    """
+
+    def __init__(
+        self,
+        matches: list[tuple[axl.Player, axl.Player, int]],
+        client: BatchClient,
+        state_file: str | os.PathLike,
+        turns: int,
+        prob_end: float | None = None,
+        noise: float = 0,
+        seed: int | None = None,
+        poll_interval: float = 60,
+    ):
+        """
+        Args:
+            matches: The matches to play.
+            client: The batch API to submit requests to.
+            state_file: The JSON file that progress is saved to.
+            turns: The number of turns per match (the maximum if `prob_end`
+                   is given).
+            prob_end: The probability that each turn ends a match.
+            noise: The probability that each intended move is flipped.
+            seed: A random seed for match lengths, noise and stochastic
+                  players.
+            poll_interval: Seconds to wait between checks on a batch.
+        """
+        self.client = client
+        self.state_file = pathlib.Path(state_file)
+        self.poll_interval = poll_interval
+        self.batch_id: str | None = None
+
+        length = turns if prob_end is None else float("inf")
+        self.matches = []
+        for player1, player2, repetition in matches:
+            match_id = _match_id((player1.name, player2.name, repetition))
+            match_seed = _seed(seed, int(match_id, 16))
+            match_turns = turns
+            if prob_end:
+                r = axl.RandomGenerator(seed=match_seed).random()
+                match_turns = min(sample_length(prob_end, r), turns)
+            self.matches.append(
+                _MatchState(
+                    match_id,
+                    player1,
+                    player2,
+                    repetition,
+                    match_turns,
+                    noise,
+                    length,
+                    match_seed,
+                )
+            )
+
+        if self.state_file.exists():
+            self._load()
+
+    def play(self, on_result=None) -> list[dict[str, Any]]:
+        """
+        Plays batch rounds until every match is finished.
+
+        `on_result` is called with the result row of each match as soon as
+        it finishes, including matches that had finished before a restart.
+        Returns the rows of all matches.
+        """
+        for match in self.matches:
+            if match.done and on_result:
+                on_result(match.result())
+
+        while active := [match for match in self.matches if not match.done]:
+            if self.batch_id is None:
+                requests = {}
+                for match in active:
+                    requests.update(match.requests())
+                if requests:
+                    self.batch_id = self.client.submit(requests)
+                    self._save()
+            results = self._wait() if self.batch_id is not None else {}
+
+            for match in active:
+                match.play_turn(results)
+                if match.done and on_result:
+                    on_result(match.result())
+            self.batch_id = None
+            self._save()
+
+        return [match.result() for match in self.matches]
+
+    def _wait(self) -> dict[str, str | None]:
+        """Polls the batch in flight until it completes."""
+        while True:
+            status = self.client.status(self.batch_id)
+            if status == "completed":
+                return self.client.results(self.batch_id)
+            if status in FAILED_STATUSES:
+                # Forget the batch so the round is resubmitted on a rerun.
+                batch_id, self.batch_id = self.batch_id, None
+                self._save()
+                raise RuntimeError(f"Batch {batch_id} ended with status {status}.")
+            time.sleep(self.poll_interval)
+
+    def _save(self) -> None:
+        state = {
+            "batch_id": self.batch_id,
+            "matches": [
+                {
+                    "key": list(match.key),
+                    "turns": match.turns,
+                    "moves": match.moves(),
+                }
+                for match in self.matches
+            ],
+        }
+        # Write to a temporary file first so that a crash mid-write never
+        # leaves a truncated state file behind.
+        temp_file = self.state_file.with_suffix(self.state_file.suffix + ".tmp")
+        temp_file.write_text(json.dumps(state))
+        os.replace(temp_file, self.state_file)
+
+    def _load(self) -> None:
+        state = json.loads(self.state_file.read_text())
+        saved = {tuple(entry["key"]): entry for entry in state["matches"]}
+        for match in self.matches:
+            entry = saved.get(match.key)
+            if entry is None:
+                continue
+            match.turns = entry["turns"]
+            match.replay(entry["moves"])
+        self.batch_id = state["batch_id"]
@@ -0,0 +1,171 @@
+"""
+Concurrency helpers for tournaments with several LLM players.
+
+`ConcurrentMatch` asks both players of an LLM-vs-LLM match for their moves
+at the same time, so a turn takes as long as the slower call rather than
+the sum of both. Provider limits cap the number of requests in flight to
+each provider, so that many concurrent matches share each provider's quota
+instead of tripping its rate limits, and `imap_within_limits` only hands a
+match to a worker once its providers have room for it, so that workers
+aren't left waiting on a busy provider while other matches could run.
+"""
+import contextlib
+import functools
+import importlib
+import multiprocessing
+import queue
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+import axelrod as axl
+
+# One semaphore per provider, shared by forked worker processes.
+_provider_semaphores: dict = {}
+
+
+@functools.cache
+def provider_of(model: str) -> str:
+    """Returns the name of the provider that serves `model`."""
+    litellm = importlib.import_module("litellm")
+    try:
+        return litellm.get_llm_provider(model)[1]
+    except Exception:
+        return model.split("/", 1)[0]
+
+
+def set_provider_limits(limits: dict[str, int], context=None) -> None:
+    """
+    Caps the number of requests in flight to each provider.
+
+    `limits` maps provider names (as given by `provider_of`) to the maximum
+    number of concurrent requests; providers without a limit are unlimited.
+    Call this before starting worker processes, with the multiprocessing
+    `context` they are started from, so that the workers share the limits.
+    """
+    context = context or multiprocessing.get_context()
+    _provider_semaphores.clear()
+    for provider, limit in limits.items():
+        _provider_semaphores[provider] = context.BoundedSemaphore(limit)
+
+
+@contextlib.contextmanager
+def provider_slot(model: str) -> Iterator[None]:
+    """Waits for a free request slot with the provider of `model`."""
+    if not _provider_semaphores:
+        yield
+        return
+    semaphore = _provider_semaphores.get(provider_of(model))
+    if semaphore is None:
+        yield
+        return
+    with semaphore:
+        yield
+
+
+def interleave(units: list, key) -> list:
+    """
+    Reorders work units so that consecutive units have different keys.
+
+    Units are dealt round-robin from one queue per `key(unit)`, keeping
+    their relative order within each queue. Keyed by the providers a unit
+    calls, this means that when units are handed to a pool of workers, no
+    single provider's quota is saturated while others sit idle.
+    """
+    queues: dict = {}
+    for unit in units:
+        queues.setdefault(key(unit), []).append(unit)
+
+    interleaved = []
+    while queues:
+        for queue_key in list(queues):
+            interleaved.append(queues[queue_key].pop(0))
+            if not queues[queue_key]:
+                del queues[queue_key]
+    return interleaved
+
+
+def imap_within_limits(
+    pool,
+    func: Callable,
+    items: Iterable,
+    demand: Callable[..., Counter],
+    limits: dict[str, int],
+    workers: int,
+) -> Iterator:
+    """
+    Applies `func` to each item in a multiprocessing `pool`, yielding the
+    results as they arrive.
+
+    `demand(item)` counts the requests that an item keeps in flight with each
+    provider. An item is only started once a worker is free and its
+    providers have room for it under `limits`, so no worker sits blocked on
+    a provider's quota. Items are started in the order given, except that
+    items waiting on a busy provider are passed over for later ones that can
+    start now. An item that needs more than a provider's whole limit is
+    started once nothing else is using that provider.
+    """
+    pending = list(items)
+    in_use: Counter = Counter()
+    running = 0
+    finished: queue.Queue = queue.Queue()
+
+    def fits(need: Counter) -> bool:
+        return all(
+            provider not in limits
+            or not in_use[provider]
+            or in_use[provider] + count <= limits[provider]
+            for provider, count in need.items()
+        )
+
+    while pending or running:
+        index = 0
+        while running < workers and index < len(pending):
+            need = demand(pending[index])
+            if not fits(need):
+                index += 1
+                continue
+            item = pending.pop(index)
+            in_use.update(need)
+            running += 1
+            pool.apply_async(
+                func,
+                (item,),
+                callback=lambda result, need=need: finished.put((need, result, None)),
+                error_callback=lambda e, need=need: finished.put((need, None, e)),
+            )
+
+        need, result, error = finished.get()
+        in_use.subtract(need)
+        running -= 1
+        if error is not None:
+            raise error
+        yield result
+
+
+class ConcurrentMatch(axl.Match):
+    """
+    A match that asks both players for their moves concurrently when both
+    are slow to respond, such as two LLM players.
+    """
+
+    def play(self):
+        with ThreadPoolExecutor(max_workers=1) as self._executor:
+            return super().play()
+
+    def simultaneous_play(self, player, coplayer, noise=0):
+        """This pits two players against each other."""
+        long_run_time = axl.Classifiers["long_run_time"]
+        if not (long_run_time(player) and long_run_time(coplayer)):
+            return super().simultaneous_play(player, coplayer, noise)
+
+        # Neither strategy updates any history, so both can run at once.
+        future = self._executor.submit(player.strategy, coplayer)
+        s2 = coplayer.strategy(player)
+        s1 = future.result()
+        if noise:
+            s1 = self._random.random_flip(s1, noise)
+            s2 = self._random.random_flip(s2, noise)
+        player.update_history(s1, s2)
+        coplayer.update_history(s2, s1)
+        return s1, s2
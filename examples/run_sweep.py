@@ -0,0 +1,203 @@
+"""
+Compares prompt variants for the LLMPlayer in a single sweep.
+
+Every prompt variant is played with every model against a set of opponents,
+as one scheduled job rather than one tournament run per variant. Matches of
+different variants are interleaved and run concurrently, identical prompts
+within a repetition are only sent to the LLM once, and each variant's mean
+score per turn is reported with a confidence interval.
+
+The result of each match is appended to a CSV file as it finishes. If the
+script is stopped and restarted, matches already in the file are skipped.
+
+To run this, you must have an LLM provider's API key set as an environment
+variable, for example:
+export OPENAI_API_KEY="your-key-here"
+
+For example, to compare two prompts with two models:
+python examples/run_sweep.py --prompt prompts/a.md --prompt prompts/b.md \
+    --model gpt-4o-mini --model gemini/gemini-2.5-flash-lite --repetitions 5
+"""
+import argparse
+import csv
+import logging
+import os
+import pathlib
+
+import axelrod as axl
+
+from concurrency import set_provider_limits
+from llm_player import DEFAULT_PROMPT_PATH
+from sweep import run_sweep, summarize_sweep
+
+
+def get_opponents():
+    """Returns the opponents that every variant plays against."""
+    return [
+        axl.Cooperator(),
+        axl.Defector(),
+        axl.TitForTat(),
+        axl.Grudger(),
+        axl.Random(),
+    ]
+
+
+FIELDNAMES = [
+    "variant",
+    "model",
+    "opponent",
+    "repetition",
+    "score",
+    "opponent_score",
+]
+
+
+def read_results(output_file):
+    """Returns the result rows already saved to `output_file`, if any."""
+    if not os.path.exists(output_file):
+        return []
+    with open(output_file, newline="") as f:
+        return [
+            {
+                **row,
+                "repetition": int(row["repetition"]),
+                "score": float(row["score"]),
+                "opponent_score": float(row["opponent_score"]),
+            }
+            for row in csv.DictReader(f)
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a prompt-variant sweep.")
+    parser.add_argument(
+        "--prompt",
+        action="append",
+        dest="prompts",
+        help=(
+            "Path to a prompt file to compare. Repeat for each variant "
+            "(default: the default prompt)."
+        ),
+    )
+    parser.add_argument(
+        "--model",
+        action="append",
+        dest="models",
+        help=(
+            "LLM model name. Repeat to sweep several models "
+            "(default: gemini/gemini-2.5-flash-lite)."
+        ),
+    )
+    parser.add_argument(
+        "--turns", type=int, default=50, help="Number of turns per match."
+    )
+    parser.add_argument(
+        "--repetitions",
+        type=int,
+        default=5,
+        help="Number of times each match is played.",
+    )
+    parser.add_argument(
+        "--noise",
+        type=float,
+        default=0,
+        help="Probability that each intended move is flipped.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of matches to play at once.",
+    )
+    parser.add_argument(
+        "--provider-limit",
+        action="append",
+        default=[],
+        metavar="PROVIDER=N",
+        help="Maximum requests in flight to a provider. Can be repeated.",
+    )
+    parser.add_argument(
+        "--no-dedupe",
+        action="store_true",
+        help=(
+            "Send every request, even if an identical one was already sent "
+            "in the same repetition."
+        ),
+    )
+    parser.add_argument(
+        "--log-file",
+        default="llm_responses.log",
+        help="File to write LLM response logs to.",
+    )
+    parser.add_argument(
+        "--output-csv",
+        default="sweep_results.csv",
+        help="CSV file to save the result of each match, and to resume from.",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Random seed.")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        filename=args.log_file,
+        level=logging.INFO,
+        format="%(asctime)s - %(message)s",
+    )
+    logger = logging.getLogger("LLMPlayerLogger")
+
+    prompt_paths = [pathlib.Path(p) for p in args.prompts or [DEFAULT_PROMPT_PATH]]
+    variants = {path.stem: path.read_text() for path in prompt_paths}
+    models = args.models or ["gemini/gemini-2.5-flash-lite"]
+
+    provider_limits = {}
+    for limit in args.provider_limit:
+        provider, _, count = limit.partition("=")
+        provider_limits[provider] = int(count)
+    if provider_limits:
+        set_provider_limits(provider_limits)
+
+    previous = read_results(args.output_csv)
+    completed = {
+        (row["variant"], row["model"], row["opponent"], row["repetition"])
+        for row in previous
+    }
+    if completed:
+        print(f"Resuming sweep: skipping {len(completed)} existing matches.")
+
+    with open(args.output_csv, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        if f.tell() == 0:
+            writer.writeheader()
+
+        def save_result(result):
+            print(
+                f"{result['variant']} ({result['model']}) vs "
+                f"{result['opponent']}: {result['score']:.3f}"
+            )
+            writer.writerow(result)
+            f.flush()
+
+        results = run_sweep(
+            variants,
+            models,
+            get_opponents(),
+            args.turns,
+            repetitions=args.repetitions,
+            noise=args.noise,
+            seed=args.seed,
+            workers=args.workers,
+            dedupe=not args.no_dedupe,
+            on_result=save_result,
+            completed=completed,
+            logger=logger,
+        )
+
+    print("\nSweep complete. Mean score per turn (95% confidence interval):")
+    for score in summarize_sweep(previous + results):
+        print(
+            f"- {score.variant} ({score.model}): {score.mean:.3f} "
+            f"[{score.ci_low:.3f}, {score.ci_high:.3f}] over {score.matches} matches"
+        )
+
+
+if __name__ == "__main__":
+    main()
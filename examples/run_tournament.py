@@ -1,14 +1,18 @@
 """
 An advanced, resumable tournament runner.
 
-This script runs a round-robin tournament between the LLMPlayer and a set of
-other strategies. It is designed to be robust to interruptions.
+This script runs a round-robin tournament between one or more LLMPlayers and
+a set of other strategies. It is designed to be robust to interruptions.
 
 Key features:
 - Runs a tournament as a series of individual matches.
 - Saves the results of each match to a CSV file as it completes.
 - Automatically resumes the tournament from where it left off if the script
   is stopped and restarted.
+- Can play all matches through a provider's batch API, advancing every
+  match by one turn per batch, for cheaper overnight runs.
+- Estimates the LLM calls, tokens and cost of the remaining matches before
+  playing, and can stop at a spending budget.
 - Demonstrates how to configure the LLMPlayer with a custom model, prompt,
   and logger.
 
@@ -17,26 +21,78 @@ variable, for example:
 export OPENAI_API_KEY="your-key-here"
 """
 import argparse
-import itertools
+import functools
+import json
 import logging
+import multiprocessing
 import os
 import random
+import statistics
+from collections import Counter
 
 import axelrod as axl
 import pandas as pd
-from llm_player import LLMPlayer
+from batch_runner import BatchTournament, LiteLLMBatchClient
+from concurrency import (
+    ConcurrentMatch,
+    imap_within_limits,
+    interleave,
+    provider_of,
+    set_provider_limits,
+)
+from llm_player import LLMPlayer, preload
+from player_spec import PlayerSpec
+from planner import (
+    cap_output_tokens,
+    plan_tournament,
+    select_within_budget,
+    summarize_plan,
+)
 
 
-def get_strategies(llm_model, llm_prompt_file, logger):
-    """Returns the list of strategies for the tournament."""
-    prompt_template = None
-    if llm_prompt_file:
-        with open(llm_prompt_file) as f:
-            prompt_template = f.read()
+def _read_prompt(prompt_file):
+    """Returns the contents of a prompt file, or None for the default prompt."""
+    if not prompt_file:
+        return None
+    with open(prompt_file) as f:
+        return f.read()
 
-    llm_player = LLMPlayer(
-        model=llm_model, prompt_template=prompt_template, logger=logger
-    )
+
+def get_strategies(
+    llm_models, llm_prompt_file, logger, roster_file=None, stream=False
+):
+    """
+    Returns the list of strategies for the tournament.
+
+    An LLMPlayer is added for each model in `llm_models`, using the prompt
+    in `llm_prompt_file` and streaming its responses if `stream` is set.
+    `roster_file` can name a JSON file holding a list of LLMPlayer keyword
+    arguments, one object per player, in which a `prompt` key gives the path
+    of that player's prompt file. For example:
+
+        [{"model": "gpt-4o-mini"}, {"model": "groq/llama3-70b-8192",
+          "name": "Llama (terse)", "prompt": "prompts/terse.md"}]
+    """
+    if isinstance(llm_models, str):
+        llm_models = [llm_models]
+    prompt_template = _read_prompt(llm_prompt_file)
+
+    llm_players = [
+        LLMPlayer(
+            model=model,
+            prompt_template=prompt_template,
+            logger=logger,
+            stream=stream,
+        )
+        for model in llm_models
+    ]
+    if roster_file:
+        with open(roster_file) as f:
+            roster = json.load(f)
+        for entry in roster:
+            entry = dict(entry)
+            entry["prompt_template"] = _read_prompt(entry.pop("prompt", None))
+            llm_players.append(LLMPlayer(logger=logger, **entry))
 
     # A selection of famous and effective strategies from the Axelrod library
     strategies = [
@@ -48,19 +104,180 @@ def get_strategies(llm_model, llm_prompt_file, logger):
         axl.EvolvedLookerUp2_2_2(),
         axl.EvolvedFSM16(),
         axl.PSOGambler2_2_2(),
-        llm_player,
+        *llm_players,
     ]
     return strategies
 
 
+# The player specs of the tournament. Worker processes receive these once,
+# when the pool starts, so that each match only carries two indices.
+_worker_specs = []
+
+
+def _init_worker(specs):
+    _worker_specs[:] = specs
+
+
+def _mean_timings(player):
+    """
+    Returns an LLM player's mean time to move and mean total time per call,
+    in seconds, or Nones for other players.
+    """
+    if not isinstance(player, LLMPlayer) or not player.timings:
+        return None, None
+    return (
+        statistics.fmean(timing["time_to_move"] for timing in player.timings),
+        statistics.fmean(timing["total_time"] for timing in player.timings),
+    )
+
+
+def _play_match(task, turns, prob_end, noise, seed, specs=None):
+    """
+    Plays a single match and returns its row for the results file.
+
+    `task` holds the indices of the two players in `specs` (by default, the
+    worker's specs) and the repetition number. The row includes the mean
+    time to move and total time of each LLM player's calls.
+    """
+    specs = specs or _worker_specs
+    index1, index2, repetition = task
+    spec1, spec2 = specs[index1], specs[index2]
+    print(f"Running match: {spec1.name} vs {spec2.name} (repetition {repetition})")
+    # Build fresh players for the match
+    p1 = spec1.build()
+    p2 = spec2.build()
+
+    # Give each repetition its own seed so repetitions aren't identical.
+    if seed is not None:
+        seed += repetition
+    # Matches between two LLM players make both players' calls at once.
+    match = ConcurrentMatch(
+        (p1, p2), turns=turns, prob_end=prob_end, noise=noise, seed=seed
+    )
+    match.play()
+    # Streamed responses finish in the background after their moves are
+    # played; wait for them so their logs and timings are complete.
+    for player in (p1, p2):
+        if isinstance(player, LLMPlayer):
+            player.wait_for_streams()
+
+    p1_time_to_move, p1_total_time = _mean_timings(p1)
+    p2_time_to_move, p2_total_time = _mean_timings(p2)
+    return {
+        "player1": p1.name,
+        "player2": p2.name,
+        "repetition": repetition,
+        "player1_score": match.final_score_per_turn()[0],
+        "player2_score": match.final_score_per_turn()[1],
+        "player1_time_to_move": p1_time_to_move,
+        "player1_total_time": p1_total_time,
+        "player2_time_to_move": p2_time_to_move,
+        "player2_total_time": p2_total_time,
+    }
+
+
+def _provider_demand(unit):
+    """Counts the requests that a unit keeps in flight with each provider."""
+    return Counter(
+        provider_of(player.model)
+        for player in (unit.player1, unit.player2)
+        if isinstance(player, LLMPlayer)
+    )
+
+
+def _providers(unit):
+    """Returns the providers that the LLM players of a unit call."""
+    return frozenset(_provider_demand(unit))
+
+
+def _check_batch_provider(strategies, batch_client):
+    """
+    Raises a ValueError if an LLM player's model isn't served by the provider
+    that runs the batches.
+    """
+    provider = getattr(batch_client, "custom_llm_provider", None)
+    if provider is None:
+        return
+    mismatched = sorted(
+        player.name
+        for player in strategies
+        if isinstance(player, LLMPlayer) and provider_of(player.model) != provider
+    )
+    if mismatched:
+        raise ValueError(
+            f"Batches run on `{provider}`, which doesn't serve these players: "
+            f"{', '.join(mismatched)}. Use --batch-provider or --model to match."
+        )
+
+
+def _check_unique_names(strategies):
+    """
+    Raises a ValueError if two strategies share a name, since results are
+    recorded and resumed by name.
+    """
+    counts = Counter(player.name for player in strategies)
+    duplicates = sorted(name for name, count in counts.items() if count > 1)
+    if duplicates:
+        raise ValueError(
+            f"Players must have unique names, but these are repeated: "
+            f"{', '.join(duplicates)}. Give each LLMPlayer a distinct `name`."
+        )
+
+
+def _worker_context():
+    """
+    Returns a multiprocessing context that forks workers where possible, so
+    they inherit the parent's already-imported modules.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
 def run_resumable_tournament(
-    strategies, turns, repetitions, output_file, seed
+    strategies,
+    turns,
+    repetitions,
+    output_file,
+    seed,
+    noise=0,
+    prob_end=None,
+    workers=1,
+    budget=None,
+    estimate_only=False,
+    batch_client=None,
+    batch_state_file="batch_state.json",
+    poll_interval=60,
+    provider_limits=None,
 ):
     """
     Runs a round-robin tournament, saving results after each match.
+
+    `noise` is the probability that each intended move is flipped. If
+    `prob_end` is given, each turn ends the match with that probability and
+    `turns` only caps the match length. With `workers` greater than one,
+    matches are played in parallel worker processes.
+
+    Before any match is played, the LLM usage of the remaining matches is
+    estimated and printed. If `budget` (in dollars) is given, every LLM
+    player's output is capped so that the estimates are upper bounds, and
+    only the most informative matches that fit in the budget are played.
+    The budget covers the whole tournament: the estimated cost of each match
+    is saved with its result, and what earlier runs spent is deducted, so
+    resuming with a higher budget plays the rest. Without a budget, models
+    that litellm has no pricing for are played at an unknown cost. With
+    `estimate_only`, no matches are played.
+
+    If a `batch_client` is given, all matches are played together through
+    the provider's batch API, one turn per batch round, with progress saved
+    to `batch_state_file` and batches polled every `poll_interval` seconds.
+
+    `provider_limits` maps provider names to the maximum number of requests
+    in flight to that provider, across all workers.
     """
-    # Create a list of all unique pairs of strategies
-    player_pairs = list(itertools.combinations(strategies, 2))
+    _check_unique_names(strategies)
+    if batch_client is not None:
+        _check_batch_provider(strategies, batch_client)
 
     # Check if the output file exists to resume
     try:
@@ -68,43 +285,139 @@ def run_resumable_tournament(
         print(f"Resuming tournament from existing results file: {output_file}")
     except FileNotFoundError:
         results_df = pd.DataFrame(
-            columns=["player1", "player2", "player1_score", "player2_score"]
+            columns=[
+                "player1",
+                "player2",
+                "repetition",
+                "player1_score",
+                "player2_score",
+                "player1_time_to_move",
+                "player1_total_time",
+                "player2_time_to_move",
+                "player2_total_time",
+                "estimated_cost",
+            ]
         )
+    if "repetition" not in results_df.columns:
+        # Results files written before repetitions were tracked hold a
+        # single repetition of each pairing.
+        results_df["repetition"] = 0
 
-    for p1_class, p2_class in player_pairs:
-        # Check if this match result already exists
-        if (
-            not results_df.empty
-            and not results_df[
-                (results_df["player1"] == p1_class.name)
-                & (results_df["player2"] == p2_class.name)
-            ].empty
-        ):
-            print(f"Skipping existing match: {p1_class.name} vs {p2_class.name}")
-            continue
-
-        print(f"Running match: {p1_class.name} vs {p2_class.name}")
-        # Instantiate players for the match
-        p1 = p1_class()
-        p2 = p2_class()
-
-        match = axl.Match((p1, p2), turns=turns, seed=seed)
-        match.play()
+    completed = set(
+        zip(
+            results_df["player1"],
+            results_df["player2"],
+            results_df["repetition"].astype(int),
+            strict=True,
+        )
+    )
+    if completed:
+        print(f"Skipping {len(completed)} existing matches.")
 
-        # Append result to the DataFrame and save
-        new_result = pd.DataFrame(
-            [
-                {
-                    "player1": p1.name,
-                    "player2": p2.name,
-                    "player1_score": match.final_score_per_turn()[0],
-                    "player2_score": match.final_score_per_turn()[1],
-                }
-            ]
+    if budget is not None:
+        strategies = cap_output_tokens(strategies)
+    units = plan_tournament(
+        strategies,
+        turns,
+        repetitions,
+        noise=noise,
+        completed=completed,
+        require_pricing=budget is not None,
+    )
+    print(f"Remaining: {summarize_plan(units)}")
+    if estimate_only:
+        return
+
+    remaining_budget = budget
+    if budget is not None and "estimated_cost" in results_df.columns:
+        spent = results_df["estimated_cost"].fillna(0).sum()
+        remaining_budget = max(budget - spent, 0)
+        print(
+            f"Spent by earlier runs: ${spent:.4f} of ${budget:.4f} "
+            "(estimated upper bound)"
         )
+    units, deferred = select_within_budget(units, remaining_budget)
+    if deferred:
+        print(f"Within budget: {summarize_plan(units)}")
+        print(f"Deferred to a later run: {summarize_plan(deferred)}")
+
+    specs = [PlayerSpec.from_player(player) for player in strategies]
+    indices = {id(player): index for index, player in enumerate(strategies)}
+
+    def task(unit):
+        return (indices[id(unit.player1)], indices[id(unit.player2)], unit.repetition)
+
+    play_match = functools.partial(
+        _play_match, turns=turns, prob_end=prob_end, noise=noise, seed=seed
+    )
+
+    costs = {unit.key: unit.cost for unit in units}
+
+    def save_result(result):
+        nonlocal results_df
+        # Record what the match may have cost, so that resumed runs can
+        # deduct it from the budget.
+        key = (result["player1"], result["player2"], result["repetition"])
+        result = {**result, "estimated_cost": costs.get(key)}
+        # Append result to the DataFrame and save
+        new_result = pd.DataFrame([result])
         results_df = pd.concat([results_df, new_result], ignore_index=True)
         results_df.to_csv(output_file, index=False)
 
+    if batch_client is not None:
+        tournament = BatchTournament(
+            [(unit.player1, unit.player2, unit.repetition) for unit in units],
+            batch_client,
+            batch_state_file,
+            turns,
+            prob_end=prob_end,
+            noise=noise,
+            seed=seed,
+            poll_interval=poll_interval,
+        )
+        tournament.play(on_result=save_result)
+        # Every match is now in the results file, so the state isn't needed
+        # to resume and would be stale for the next run. No state is written
+        # when there were no matches left to play.
+        if os.path.exists(batch_state_file):
+            os.remove(batch_state_file)
+    elif workers > 1 and len(units) > 1:
+        # Load the LLM client libraries once here so the forked workers
+        # don't each pay for the import on their first turn.
+        preload()
+        context = _worker_context()
+        if provider_limits:
+            set_provider_limits(provider_limits, context)
+        # Hand out matches so that the workers spread their requests across
+        # providers, and only once the providers have room for them, rather
+        # than all queueing on one provider's quota.
+        units = interleave(units, _providers)
+        demands = {task(unit): _provider_demand(unit) for unit in units}
+        with context.Pool(
+            workers, initializer=_init_worker, initargs=(specs,)
+        ) as pool:
+            for result in imap_within_limits(
+                pool,
+                play_match,
+                demands,
+                demands.get,
+                provider_limits or {},
+                workers,
+            ):
+                save_result(result)
+    else:
+        if provider_limits:
+            set_provider_limits(provider_limits)
+        for unit in units:
+            save_result(play_match(task(unit), specs=specs))
+
+    if deferred:
+        print(
+            f"\nBudget of ${budget:.4f} reached with {len(deferred)} matches "
+            "left. Run again with a higher --budget to resume."
+        )
+        return
+
     print("\nTournament complete.")
     print("Final Results:")
     print(results_df)
@@ -114,14 +427,35 @@ def main():
     parser = argparse.ArgumentParser(description="Run a resumable tournament.")
     parser.add_argument(
         "--model",
-        default="gemini/gemini-2.5-flash-lite",
-        help="LLM model name for the LLMPlayer.",
+        action="append",
+        dest="models",
+        help=(
+            "LLM model name for an LLMPlayer. Repeat to add several models "
+            "(default: gemini/gemini-2.5-flash-lite)."
+        ),
+    )
+    parser.add_argument(
+        "--roster",
+        default=None,
+        help="JSON file listing LLMPlayer configurations to add.",
+    )
+    parser.add_argument(
+        "--provider-limit",
+        action="append",
+        default=[],
+        metavar="PROVIDER=N",
+        help="Maximum requests in flight to a provider. Can be repeated.",
     )
     parser.add_argument(
         "--prompt",
         default=None,
         help="Path to a custom prompt file for the LLMPlayer.",
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream LLM responses and play each move as soon as it's decoded.",
+    )
     parser.add_argument(
         "--log-file",
         default="llm_responses.log",
@@ -133,15 +467,72 @@ def main():
         help="CSV file to save tournament results.",
     )
     parser.add_argument(
-        "--turns", type=int, default=50, help="Number of turns per match."
+        "--turns",
+        type=int,
+        default=50,
+        help="Number of turns per match (the maximum if --prob-end is set).",
+    )
+    parser.add_argument(
+        "--noise",
+        type=float,
+        default=0,
+        help="Probability that each intended move is flipped.",
+    )
+    parser.add_argument(
+        "--prob-end",
+        type=float,
+        default=None,
+        help="Probability that each turn ends the match.",
     )
     parser.add_argument(
         "--repetitions",
         type=int,
-        default=5,
-        help="Number of repetitions (not used in this script, but common).",
+        default=1,
+        help="Number of times each pairing is played.",
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=None,
+        help=(
+            "Maximum total spend in dollars for the tournament, including "
+            "earlier runs that it resumes. LLM responses are capped at their "
+            "estimated length, so the estimate is an upper bound."
+        ),
+    )
+    parser.add_argument(
+        "--estimate-only",
+        action="store_true",
+        help="Print the estimated LLM usage and exit without playing.",
     )
     parser.add_argument("--seed", type=int, default=None, help="Random seed.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes to play matches in parallel.",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Play all matches through the provider's batch API.",
+    )
+    parser.add_argument(
+        "--batch-provider",
+        default="openai",
+        help="litellm provider that runs the batches.",
+    )
+    parser.add_argument(
+        "--batch-state",
+        default="batch_state.json",
+        help="File to save batch progress to, for resuming.",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=60,
+        help="Seconds to wait between checks on a batch.",
+    )
     args = parser.parse_args()
 
     # Set up logging
@@ -157,9 +548,35 @@ def main():
         random.seed(args.seed)
         axl.seed(args.seed)
 
-    strategies = get_strategies(args.model, args.prompt, logger)
+    models = args.models
+    if not models and not args.roster:
+        models = ["gemini/gemini-2.5-flash-lite"]
+    strategies = get_strategies(
+        models or [], args.prompt, logger, args.roster, stream=args.stream
+    )
+
+    provider_limits = {}
+    for limit in args.provider_limit:
+        provider, _, count = limit.partition("=")
+        provider_limits[provider] = int(count)
+
     run_resumable_tournament(
-        strategies, args.turns, args.repetitions, args.output_csv, args.seed
+        strategies,
+        args.turns,
+        args.repetitions,
+        args.output_csv,
+        args.seed,
+        noise=args.noise,
+        prob_end=args.prob_end,
+        workers=args.workers,
+        budget=args.budget,
+        estimate_only=args.estimate_only,
+        batch_client=(
+            LiteLLMBatchClient(args.batch_provider) if args.batch else None
+        ),
+        batch_state_file=args.batch_state,
+        poll_interval=args.poll_interval,
+        provider_limits=provider_limits,
     )
 
 
@@ -1,11 +1,142 @@
+import contextlib
+import functools
+import hashlib
+import importlib
+import inspect
 import logging
 import pathlib
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from types import ModuleType
 from typing import Any
 
 import axelrod as axl
-import litellm
 from pydantic import BaseModel, Field
 
+from concurrency import provider_slot
+from move_parsing import (
+    StreamingMoveParser,
+    chunk_content,
+    move_from_response,
+    parse_move,
+)
+
+DEFAULT_PROMPT_PATH = (
+    pathlib.Path(__file__).parent / "prompts" / "llm_player_prompt.md"
+)
+
+
+class _LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access.
+
+    `litellm` pulls in many provider SDKs and takes seconds to import, so it
+    is only loaded when a player first asks for a completion.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: ModuleType | None = None
+        self._lock = threading.Lock()
+
+    def load(self) -> ModuleType:
+        """Imports the module if it has not been imported yet."""
+        if self._module is None:
+            # Players of a concurrent match can ask for their first
+            # completion at the same moment, so only one thread imports.
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+
+litellm = _LazyModule("litellm")
+
+
+def preload() -> None:
+    """
+    Imports the LLM client libraries now rather than on the first turn.
+
+    Call this in a parent process before forking workers so that each worker
+    starts with the libraries already loaded.
+    """
+    litellm.load()
+
+
+@functools.cache
+def _default_prompt_template() -> str:
+    """Reads the default prompt once per process."""
+    return DEFAULT_PROMPT_PATH.read_text()
+
+
+@functools.cache
+def _init_signature(cls: type) -> inspect.Signature:
+    """Returns the signature of `cls.__init__` without `self`."""
+    signature = inspect.signature(cls.__init__)
+    return signature.replace(parameters=list(signature.parameters.values())[1:])
+
+
+@functools.cache
+def _check_move_field(response_model: type[BaseModel], move_field: str) -> None:
+    """Checks once per response model that it has the move field."""
+    if move_field not in response_model.model_fields:
+        raise ValueError(
+            f"`{move_field}` is not a valid field in `{response_model.__name__}`."
+        )
+
+
+class ResponseCache:
+    """
+    Shares LLM responses between players that send identical requests.
+
+    Players given the same cache make one call per distinct request (model,
+    rendered prompt and completion arguments). Requests are keyed by a digest
+    rather than by their prompts, which can be several kilobytes; later
+    identical requests
+    reuse the response, and requests made while the first is still in
+    flight wait for it rather than calling the LLM again. Failed calls are
+    not cached.
+
+    Reusing responses makes repeated requests return the same sampled
+    answer, which is exact for deterministic (temperature 0) models.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._responses: dict[tuple, Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __reduce__(self):
+        # Responses can't be shared across processes, so a pickled cache
+        # arrives empty.
+        return (ResponseCache, ())
+
+    def get(self, key: tuple, call: Callable[[], Any]) -> Any:
+        """Returns the response for `key`, calling `call` if there isn't one."""
+        with self._lock:
+            future = self._responses.get(key)
+            owner = future is None
+            if owner:
+                future = self._responses[key] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if owner:
+            try:
+                future.set_result(call())
+            except BaseException as e:
+                with self._lock:
+                    del self._responses[key]
+                future.set_exception(e)
+        return future.result()
+
 
 # Define the default Pydantic model for the response
 class DefaultResponse(BaseModel):
@@ -42,6 +173,8 @@ class LLMPlayer(axl.Player):
         move_field: str = "move",
         logger: logging.Logger | None = None,
         api_key: str | None = None,
+        stream: bool = False,
+        response_cache: ResponseCache | None = None,
         **kwargs: Any,
     ):
         """
@@ -58,6 +191,12 @@ class LLMPlayer(axl.Player):
             api_key: An optional API key for the LLM provider. If not
                      provided, `litellm` will attempt to find it from
                      environment variables.
+            stream: Whether to stream responses. The move is then played as
+                    soon as it has been decoded, while the rest of the
+                    response is received in the background for logging.
+            response_cache: An optional cache shared with other players, so
+                            that identical requests are only sent once.
+                            Streamed responses are not cached.
             **kwargs: Additional keyword arguments to pass to `litellm.completion`.
         """
         super().__init__()
@@ -71,16 +210,16 @@ class LLMPlayer(axl.Player):
 
         self.model = model
         self.api_key = api_key
-        self.logger = logger or logging.getLogger(__name__).addHandler(
-            logging.NullHandler()
-        )
+        self.stream = stream
+        self.response_cache = response_cache
+        self.logger = logger
+        # The time taken to decide each move and to receive the whole
+        # response, one entry per turn that called the LLM.
+        self.timings: list[dict[str, float]] = []
+        self._streams: list[threading.Thread] = []
 
         if prompt_template is None:
-            # Load the default prompt from the file
-            prompt_path = (
-                pathlib.Path(__file__).parent / "prompts" / "llm_player_prompt.md"
-            )
-            self.prompt_template = prompt_path.read_text()
+            self.prompt_template = _default_prompt_template()
         else:
             self.prompt_template = prompt_template
 
@@ -88,55 +227,238 @@ class LLMPlayer(axl.Player):
         self.move_field = move_field
         self.litellm_kwargs = kwargs
 
-        if self.move_field not in self.response_model.model_fields:
-            raise ValueError(
-                f"`{self.move_field}` is not a valid field in "
-                f"`{self.response_model.__name__}`."
-            )
+        _check_move_field(self.response_model, self.move_field)
 
-    def _generate_prompt(self, opponent: axl.Player) -> str:
-        """Formats the prompt with the current game history."""
+    @classmethod
+    def init_params(cls, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        """
+        Returns the init parameters used to clone the player.
+
+        Extra keyword arguments are flattened into the parameters, so that
+        `clone` passes them back by name rather than as a `kwargs` argument,
+        and the signature is only inspected once per class.
+        """
+        bound = _init_signature(cls).bind_partial(*args, **kwargs)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        params.update(params.pop("kwargs", {}))
+        return params
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Used for pickling. Background stream threads are left behind."""
+        state = dict(self.__dict__)
+        state["_streams"] = []
+        return state
+
+    def _prompt_variables(self, opponent: axl.Player) -> dict[str, str]:
+        """
+        Returns the values substituted into the prompt template.
+
+        All of these change from turn to turn, so templates should place them
+        after the static rules text. That keeps the rendered prompts of a
+        match sharing one long prefix, which providers can cache.
+        """
         history_str = "".join(str(move) for move in self.history)
         opponent_history_str = "".join(str(move) for move in opponent.history)
-        return self.prompt_template.format(
-            history=history_str or "None",
-            opponent_history=opponent_history_str or "None",
-        )
+
+        # Matches with a probabilistic end report an infinite length, and
+        # players outside of a match report a length of -1.
+        length = self.match_attributes["length"]
+        if length == float("inf") or length < 0:
+            turns_remaining = "Unknown"
+        else:
+            turns_remaining = str(length - len(self.history))
+
+        return {
+            "history": history_str or "None",
+            "opponent_history": opponent_history_str or "None",
+            "turns_remaining": turns_remaining,
+            "noise": f"{self.match_attributes['noise']:g}",
+        }
+
+    def _generate_prompt(self, opponent: axl.Player) -> str:
+        """Formats the prompt with the current game state."""
+        return self.prompt_template.format(**self._prompt_variables(opponent))
 
     def strategy(self, opponent: axl.Player) -> axl.Action:
         """
         Queries the LLM for the next move based on the game history.
         """
         prompt = self._generate_prompt(opponent)
+        messages = [{"role": "user", "content": prompt}]
         try:
+            if self.stream:
+                move = self._stream_move(messages)
+            else:
+                start = time.perf_counter()
+                response = self._completion(messages)
+                elapsed = time.perf_counter() - start
+                self._record_timing(len(self.history), elapsed, elapsed)
+
+                if self.logger:
+                    self.logger.info(
+                        f"LLM response for player {self.name}: {response}"
+                    )
+
+                move = move_from_response(
+                    response, self.response_model, self.move_field
+                )
+
+            if move is None:
+                # Fallback if the response doesn't hold a valid move
+                return self._fallback_strategy()
+            return move
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Error calling LLM for player {self.name}: {e}")
+            # Fallback in case of API errors or other exceptions
+            return self._fallback_strategy()
+
+    def _completion(self, messages: list[dict[str, str]]) -> Any:
+        """Calls the LLM, or reuses the shared response to the same request."""
+
+        def call() -> Any:
             # Use litellm's structured output feature with the Pydantic model
-            response = litellm.completion(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                response_model=self.response_model,
-                api_key=self.api_key,
-                **self.litellm_kwargs,
+            with provider_slot(self.model):
+                return litellm.completion(
+                    model=self.model,
+                    messages=messages,
+                    response_model=self.response_model,
+                    api_key=self.api_key,
+                    **self.litellm_kwargs,
+                )
+
+        if self.response_cache is None:
+            return call()
+        request = repr(
+            (self.model, messages, sorted(self.litellm_kwargs.items()))
+        )
+        key = (self.response_model, hashlib.sha256(request.encode()).digest())
+        return self.response_cache.get(key, call)
+
+    def _stream_move(self, messages: list[dict[str, str]]) -> axl.Action | None:
+        """
+        Streams a completion and returns the move as soon as it is decoded.
+
+        The rest of the stream is consumed on a background thread, which logs
+        the full response and records the total time once the stream ends.
+        """
+        parser = StreamingMoveParser(self.response_model, self.move_field)
+        turn = len(self.history)
+        start = time.perf_counter()
+
+        # The request keeps its provider slot until the stream ends, which
+        # may be after the move has been returned.
+        slot = contextlib.ExitStack()
+        slot.enter_context(provider_slot(self.model))
+        try:
+            chunks = iter(
+                litellm.completion(
+                    model=self.model,
+                    messages=messages,
+                    response_model=self.response_model,
+                    api_key=self.api_key,
+                    stream=True,
+                    **self.litellm_kwargs,
+                )
             )
+            for chunk in chunks:
+                if parser.feed(chunk_content(chunk)) is not None:
+                    break
+        except BaseException:
+            slot.close()
+            raise
 
-            if self.logger:
-                self.logger.info(f"LLM response for player {self.name}: {response}")
+        if parser.move is None:
+            # The stream ended without an early move, so the move is only
+            # known once the full response has been parsed.
+            slot.close()
+            self._finish_stream(parser, turn, start)
+            return parser.move
 
-            # Extract the move from the Pydantic object
-            move_str = getattr(response, self.move_field)
+        time_to_move = time.perf_counter() - start
 
-            if str(move_str).lower() == "c":
-                return axl.Action.C
-            if str(move_str).lower() == "d":
-                return axl.Action.D
+        thread = threading.Thread(
+            target=self._drain_stream,
+            args=(chunks, parser, slot, turn, start, time_to_move),
+            daemon=True,
+        )
+        thread.start()
+        self._streams.append(thread)
+        return parser.move
 
-            # Fallback if the response is not 'C' or 'D'
-            return self._fallback_strategy()
+    def _drain_stream(
+        self,
+        chunks: Any,
+        parser: StreamingMoveParser,
+        slot: contextlib.ExitStack,
+        turn: int,
+        start: float,
+        time_to_move: float,
+    ) -> None:
+        """Receives the rest of a stream after the move has been played."""
+        try:
+            for chunk in chunks:
+                parser.feed(chunk_content(chunk))
         except Exception as e:
             if self.logger:
-                self.logger.error(f"Error calling LLM for player {self.name}: {e}")
-            # Fallback in case of API errors or other exceptions
+                self.logger.error(
+                    f"Error streaming LLM response for player {self.name}: {e}"
+                )
+        finally:
+            slot.close()
+        self._finish_stream(parser, turn, start, time_to_move)
+
+    def _finish_stream(
+        self,
+        parser: StreamingMoveParser,
+        turn: int,
+        start: float,
+        time_to_move: float | None = None,
+    ) -> None:
+        """Parses, logs and times a response once its stream has ended."""
+        parser.finish()
+        total_time = time.perf_counter() - start
+        if time_to_move is None:
+            time_to_move = total_time
+        self._record_timing(turn, time_to_move, total_time)
+        if self.logger:
+            self.logger.info(f"LLM response for player {self.name}: {parser.text}")
+
+    def _record_timing(self, turn: int, time_to_move: float, total_time: float) -> None:
+        self.timings.append(
+            {"turn": turn, "time_to_move": time_to_move, "total_time": total_time}
+        )
+
+    def wait_for_streams(self, timeout: float | None = None) -> None:
+        """
+        Waits for responses still streaming in the background, so that their
+        logs and timings are complete.
+        """
+        for thread in self._streams:
+            thread.join(timeout)
+        self._streams = [thread for thread in self._streams if thread.is_alive()]
+
+    def _move_from_content(self, content: str | None) -> axl.Action:
+        """
+        Converts the raw text of an LLM response to an action.
+
+        This is used where the response arrives as text rather than through
+        `strategy`, such as in the results of a batch job. A missing or
+        malformed response falls back like a failed call would.
+        """
+        move = parse_move(content, self.response_model, self.move_field)
+        if move is None:
+            if self.logger:
+                self.logger.error(
+                    f"Invalid LLM response for player {self.name}: {content!r}"
+                )
             return self._fallback_strategy()
 
+        if self.logger:
+            self.logger.info(f"LLM response for player {self.name}: {content}")
+        return move
+
     def _fallback_strategy(self) -> axl.Action:
         """A default strategy in case of LLM failure."""
         # A simple fallback: cooperate on the first move, then defect.
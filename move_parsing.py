@@ -0,0 +1,172 @@
+"""
+Parsing of LLM players' moves from their responses.
+
+A response is first validated against the player's response model, using a
+validator compiled once per model. Models don't always follow the schema, so
+when validation fails the move is extracted more tolerantly: from a JSON
+object embedded in prose, from the move field alone, or from a reply that
+is nothing but a move, such as "Cooperate.". Move values are matched loosely, so
+"C", "c" and "Cooperate" all mean cooperation.
+
+`StreamingMoveParser` finds the move in a response that is still being
+streamed, as soon as the move field is complete, without waiting for the
+rest of the response.
+"""
+import functools
+import re
+from typing import Any
+
+import axelrod as axl
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+C, D = axl.Action.C, axl.Action.D
+
+_MOVES = {
+    "c": C,
+    "cooperate": C,
+    "cooperation": C,
+    "d": D,
+    "defect": D,
+    "defection": D,
+}
+
+
+def normalize_move(value: Any) -> axl.Action | None:
+    """Returns the action that a move value names, or None if it names none."""
+    if isinstance(value, axl.Action):
+        return value
+    return _MOVES.get(str(value).strip().strip("'\"`*.!").lower())
+
+
+@functools.cache
+def _validator(response_model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(response_model)
+
+
+@functools.cache
+def _complete_field(move_field: str) -> re.Pattern:
+    """Matches the move field once its JSON string value is complete."""
+    return re.compile(rf'"{re.escape(move_field)}"\s*:\s*"([^"]*)"')
+
+
+@functools.cache
+def _loose_field(move_field: str) -> re.Pattern:
+    """
+    Matches the move field written as a key: at the start of a line (such as
+    "Move: C" or "- **move** = D"), or quoted inside a JSON-like object.
+    Mentions of a move in prose, such as "the opponent's last move: D", are
+    not keys and don't match.
+    """
+    name = re.escape(move_field)
+    return re.compile(
+        rf"(?:^[ \t]*(?:[-*][ \t]+)?[\"'`*]*{name}[\"'`*]*[ \t]*[:=]"
+        rf"|[{{,]\s*\"{name}\"\s*:)"
+        rf"\s*[\"'`*]*\s*(\w+)",
+        re.IGNORECASE | re.MULTILINE,
+    )
+
+
+def _validate(
+    text: str, response_model: type[BaseModel], move_field: str
+) -> axl.Action | None:
+    response = _validator(response_model).validate_json(text)
+    return normalize_move(getattr(response, move_field))
+
+
+def parse_move(
+    text: str | None, response_model: type[BaseModel], move_field: str = "move"
+) -> axl.Action | None:
+    """
+    Returns the move in the text of a response, or None if there isn't one.
+    """
+    if not text:
+        return None
+    try:
+        return _validate(text, response_model, move_field)
+    except ValidationError:
+        pass
+
+    # A JSON object wrapped in prose or a code fence.
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            return _validate(text[start : end + 1], response_model, move_field)
+        except ValidationError:
+            pass
+
+    # A response that gives conflicting moves doesn't give a move at all.
+    moves = {
+        normalize_move(match.group(1))
+        for match in _loose_field(move_field).finditer(text)
+    }
+    moves.discard(None)
+    if moves:
+        return moves.pop() if len(moves) == 1 else None
+
+    # Move words elsewhere in prose can be negated ("I won't cooperate"), so
+    # they only count when they are the whole reply.
+    return normalize_move(text)
+
+
+def response_content(response: Any) -> str | None:
+    """Returns the message text of a litellm completion response."""
+    try:
+        return response.choices[0].message.content
+    except (AttributeError, IndexError, TypeError):
+        return None
+
+
+def chunk_content(chunk: Any) -> str | None:
+    """Returns the text of a chunk of a streamed litellm completion."""
+    try:
+        return chunk.choices[0].delta.content
+    except (AttributeError, IndexError, TypeError):
+        return None
+
+
+def move_from_response(
+    response: Any, response_model: type[BaseModel], move_field: str = "move"
+) -> axl.Action | None:
+    """
+    Returns the move in a completion response, which may be an instance of
+    the response model or a raw litellm response.
+    """
+    if isinstance(response, BaseModel) and move_field in type(response).model_fields:
+        return normalize_move(getattr(response, move_field))
+    return parse_move(response_content(response), response_model, move_field)
+
+
+class StreamingMoveParser:
+    """
+    Finds the move in a response as it is streamed.
+
+    Feed each chunk of text to `feed`, which returns the move as soon as the
+    move field's value is complete, and None until then. Once the stream has
+    ended, `finish` parses the full text for responses in which the move
+    couldn't be found early.
+    """
+
+    def __init__(self, response_model: type[BaseModel], move_field: str = "move"):
+        self.response_model = response_model
+        self.move_field = move_field
+        self.move: axl.Action | None = None
+        self.text = ""
+        self._pattern = _complete_field(move_field)
+        self._field_complete = False
+
+    def feed(self, chunk: str | None) -> axl.Action | None:
+        """Adds a chunk of the response and returns the move, if known yet."""
+        if chunk:
+            self.text += chunk
+            if not self._field_complete:
+                match = self._pattern.search(self.text)
+                if match:
+                    self._field_complete = True
+                    self.move = normalize_move(match.group(1))
+        return self.move
+
+    def finish(self) -> axl.Action | None:
+        """Returns the move, parsing the full text if it wasn't found early."""
+        if self.move is None:
+            self.move = parse_move(self.text, self.response_model, self.move_field)
+        return self.move
@@ -0,0 +1,230 @@
+"""
+Cost estimation and budgeted scheduling for tournaments with LLM players.
+
+A tournament is broken into work units, one per match (pair of players and
+repetition). Each unit carries an estimate of the LLM calls, tokens and
+dollars it will consume, worked out from the player's rendered prompt and
+litellm's model cost tables. Every match is assumed to run for the full
+number of turns and every response to use its full output allowance, which
+is its `max_tokens`. `cap_output_tokens` gives every LLM player a
+`max_tokens`, so that the estimates are upper bounds on what is spent.
+"""
+import dataclasses
+import itertools
+import math
+import random
+
+import axelrod as axl
+
+from llm_player import LLMPlayer, litellm
+
+# Extra share of the history's tokens allowed for, since the token count of
+# a history doesn't grow exactly linearly with its length.
+HISTORY_MARGIN = 0.1
+
+# Output tokens allowed per call for players that don't set `max_tokens`.
+# This comfortably covers the default JSON move and a short rationale.
+DEFAULT_OUTPUT_TOKENS = 150
+
+
+@dataclasses.dataclass(frozen=True)
+class WorkUnit:
+    """A single match of a tournament and its estimated LLM usage."""
+
+    player1: axl.Player
+    player2: axl.Player
+    repetition: int
+    llm_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost: float = 0.0
+
+    @property
+    def key(self) -> tuple[str, str, int]:
+        """Identifies the unit in a results file."""
+        return (self.player1.name, self.player2.name, self.repetition)
+
+
+@dataclasses.dataclass(frozen=True)
+class Usage:
+    """The estimated LLM usage of one player over one match."""
+
+    llm_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost: float = 0.0
+
+    def __add__(self, other: "Usage") -> "Usage":
+        return Usage(
+            self.llm_calls + other.llm_calls,
+            self.input_tokens + other.input_tokens,
+            self.output_tokens + other.output_tokens,
+            self.cost + other.cost,
+        )
+
+
+def estimate_player_usage(
+    player: axl.Player,
+    turns: int,
+    noise: float = 0,
+    output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+    require_pricing: bool = True,
+) -> Usage:
+    """
+    Estimates the LLM usage of `player` over a match of `turns` turns.
+
+    The prompt grows linearly with the history, so the input tokens are
+    taken as the average of the first and last prompt of the match. Mixed
+    histories take more tokens than runs of one move, so the last prompt is
+    rendered with both alternating and random histories, and the larger of
+    the two is used, with a margin of `HISTORY_MARGIN` on the tokens the
+    history adds. Players
+    that aren't `LLMPlayer`s make no calls. If litellm has no pricing for the
+    player's model, a ValueError is raised, or the cost is NaN (unknown)
+    when `require_pricing` is false.
+    """
+    if not isinstance(player, LLMPlayer) or turns < 1:
+        return Usage()
+
+    def count_tokens(moves: list[tuple[axl.Action, axl.Action]]) -> int:
+        # Render the prompt through the player's own prompt generation, so
+        # custom templates and variables are accounted for.
+        probe = player.clone()
+        opponent = axl.Cooperator()
+        for p in (probe, opponent):
+            p.set_match_attributes(length=turns, noise=noise)
+        for move, opponent_move in moves:
+            probe.update_history(move, opponent_move)
+            opponent.update_history(opponent_move, move)
+        return litellm.token_counter(
+            model=player.model,
+            messages=[{"role": "user", "content": probe._generate_prompt(opponent)}],
+        )
+
+    C, D = axl.Action.C, axl.Action.D
+    rng = random.Random(0)
+    alternating = [(C, D) if turn % 2 else (D, C) for turn in range(turns - 1)]
+    mixed = [(rng.choice((C, D)), rng.choice((C, D))) for _ in range(turns - 1)]
+    first_tokens = count_tokens([])
+    last_tokens = max(count_tokens(alternating), count_tokens(mixed))
+    last_tokens += math.ceil(HISTORY_MARGIN * (last_tokens - first_tokens))
+    input_tokens = -(-turns * (first_tokens + last_tokens) // 2)
+    output_tokens = turns * (player.litellm_kwargs.get("max_tokens") or output_tokens)
+
+    try:
+        input_cost, output_cost = litellm.cost_per_token(
+            model=player.model,
+            prompt_tokens=input_tokens,
+            completion_tokens=output_tokens,
+        )
+    except Exception as e:
+        if not require_pricing:
+            return Usage(turns, input_tokens, output_tokens, math.nan)
+        raise ValueError(f"No pricing is known for model `{player.model}`.") from e
+
+    return Usage(turns, input_tokens, output_tokens, input_cost + output_cost)
+
+
+def plan_tournament(
+    strategies: list[axl.Player],
+    turns: int,
+    repetitions: int,
+    noise: float = 0,
+    completed: set[tuple[str, str, int]] | None = None,
+    output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+    require_pricing: bool = True,
+) -> list[WorkUnit]:
+    """
+    Enumerates the work units of a round-robin tournament, most informative
+    first.
+
+    Every pairing is played once before any pairing is repeated, since a
+    first result tells us more than a repeat. Within a repetition, cheaper
+    matches come first so that a budget covers as many pairings as possible.
+    Units whose keys are in `completed` are left out. Units of unknown cost
+    (see `estimate_player_usage`) come last within their repetition.
+    """
+    completed = completed or set()
+    usages = {
+        id(player): estimate_player_usage(
+            player, turns, noise, output_tokens, require_pricing
+        )
+        for player in strategies
+    }
+
+    units = []
+    for repetition in range(repetitions):
+        for p1, p2 in itertools.combinations(strategies, 2):
+            if (p1.name, p2.name, repetition) in completed:
+                continue
+            usage = usages[id(p1)] + usages[id(p2)]
+            units.append(WorkUnit(p1, p2, repetition, **dataclasses.asdict(usage)))
+    return sorted(
+        units,
+        key=lambda unit: (
+            unit.repetition,
+            math.inf if math.isnan(unit.cost) else unit.cost,
+        ),
+    )
+
+
+def cap_output_tokens(
+    strategies: list[axl.Player], output_tokens: int = DEFAULT_OUTPUT_TOKENS
+) -> list[axl.Player]:
+    """
+    Returns the strategies with every LLM player's output capped.
+
+    LLM players that don't set `max_tokens` are replaced by copies with
+    `max_tokens=output_tokens`, so that no response can cost more than its
+    estimate.
+    """
+    capped = []
+    for player in strategies:
+        if isinstance(player, LLMPlayer) and not player.litellm_kwargs.get(
+            "max_tokens"
+        ):
+            player = type(player)(
+                **{**player.init_kwargs, "max_tokens": output_tokens}
+            )
+        capped.append(player)
+    return capped
+
+
+def select_within_budget(
+    units: list[WorkUnit], budget: float | None
+) -> tuple[list[WorkUnit], list[WorkUnit]]:
+    """
+    Splits planned units into those that fit in `budget` (in dollars) and
+    those deferred to a later run.
+
+    Scheduling stops at the first unit that doesn't fit, so the units that
+    are run are always the most informative ones.
+    """
+    if budget is None:
+        return units, []
+    spent = 0.0
+    for index, unit in enumerate(units):
+        if spent + unit.cost > budget:
+            return units[:index], units[index:]
+        spent += unit.cost
+    return units, []
+
+
+def summarize_plan(units: list[WorkUnit]) -> str:
+    """Returns a one-line summary of the estimated usage of `units`."""
+    total = sum(
+        (
+            Usage(u.llm_calls, u.input_tokens, u.output_tokens, u.cost)
+            for u in units
+        ),
+        Usage(),
+    )
+    if math.isnan(total.cost):
+        cost = "unknown cost (no pricing for some models)"
+    else:
+        cost = f"estimated cost ${total.cost:.4f}"
+    return (
+        f"{len(units)} matches, {total.llm_calls} LLM calls, "
+        f"{total.input_tokens} input tokens, {total.output_tokens} output "
+        f"tokens, {cost}"
+    )
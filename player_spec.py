@@ -0,0 +1,32 @@
+"""
+Declarative player specifications for building players in bulk.
+
+A `PlayerSpec` records a player's class and constructor arguments, which is
+all that's needed to build a fresh copy of the player for each match. Specs
+are small and cheap to pickle, so they can be sent to worker processes in
+place of configured player instances. Every player built from a spec shares
+the spec's argument values, such as the prompt template, rather than each
+holding its own copy.
+"""
+import dataclasses
+from typing import Any
+
+import axelrod as axl
+
+
+@dataclasses.dataclass(frozen=True)
+class PlayerSpec:
+    """A player's class and the keyword arguments to construct it with."""
+
+    cls: type[axl.Player]
+    kwargs: dict[str, Any] = dataclasses.field(default_factory=dict)
+    name: str | None = None
+
+    @classmethod
+    def from_player(cls, player: axl.Player) -> "PlayerSpec":
+        """Returns the spec that `player` was constructed from."""
+        return cls(type(player), dict(player.init_kwargs), player.name)
+
+    def build(self) -> axl.Player:
+        """Returns a new player, with no history."""
+        return self.cls(**self.kwargs)
@@ -0,0 +1,232 @@
+"""
+Prompt-variant sweeps: comparing prompts across models and opponents.
+
+A sweep plays every combination of prompt variant, model, opponent and
+repetition as one scheduled job, instead of one tournament run per variant.
+Matches run concurrently on a thread pool and are dealt round-robin across
+variants, so every variant progresses at the same rate and shares the
+providers' quota (see `concurrency.set_provider_limits`). Each repetition
+uses the same seed for every variant, so variants are compared on the same
+noise and match lengths.
+
+The LLM players of each repetition share one `ResponseCache`, so identical
+rendered prompts within a repetition are only sent once. In practice these
+are the turns of one variant and model whose histories coincide across
+opponents, such as the first turn and turns against opponents that have
+played alike so far; different variants render to different prompts, so
+they don't share responses. Each repetition draws its own responses, so
+repetitions are independent samples, and confidence intervals are taken over
+the mean score of each repetition. A repetition's cache is dropped once its
+last match has finished.
+"""
+import dataclasses
+import itertools
+import statistics
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any
+
+import axelrod as axl
+import scipy.stats
+
+from concurrency import ConcurrentMatch, interleave
+from llm_player import LLMPlayer, ResponseCache
+
+
+@dataclasses.dataclass(frozen=True)
+class SweepMatch:
+    """One match of a sweep: a variant and model against an opponent."""
+
+    variant: str
+    model: str
+    opponent: int
+    repetition: int
+
+
+@dataclasses.dataclass(frozen=True)
+class VariantScore:
+    """The mean score per turn of a variant and model, with a confidence interval."""
+
+    variant: str
+    model: str
+    matches: int
+    mean: float
+    ci_low: float
+    ci_high: float
+
+
+def plan_sweep(
+    variants: dict[str, str],
+    models: list[str],
+    opponents: list[axl.Player],
+    repetitions: int = 1,
+) -> list[SweepMatch]:
+    """
+    Enumerates the matches of a sweep, dealt round-robin across variants.
+
+    Earlier repetitions come first, so that a sweep stopped part way still
+    has results for every variant.
+    """
+    matches = [
+        SweepMatch(variant, model, opponent, repetition)
+        for repetition, variant, model, opponent in itertools.product(
+            range(repetitions), variants, models, range(len(opponents))
+        )
+    ]
+    by_repetition = itertools.groupby(matches, lambda match: match.repetition)
+    return [
+        match
+        for _, group in by_repetition
+        for match in interleave(list(group), lambda match: match.variant)
+    ]
+
+
+def confidence_interval(
+    scores: list[float], confidence: float = 0.95
+) -> tuple[float, float, float]:
+    """Returns the mean of `scores` and its Student's t confidence interval."""
+    mean = statistics.fmean(scores)
+    if len(scores) < 2:
+        return mean, float("nan"), float("nan")
+    margin = scipy.stats.t.ppf((1 + confidence) / 2, len(scores) - 1) * (
+        statistics.stdev(scores) / len(scores) ** 0.5
+    )
+    return mean, mean - margin, mean + margin
+
+
+def summarize_sweep(
+    results: list[dict[str, Any]], confidence: float = 0.95
+) -> list[VariantScore]:
+    """
+    Returns the score of each variant and model, best first.
+
+    Matches within a repetition can share responses, so they aren't
+    independent; the confidence interval is taken over the mean score of
+    each repetition instead, and needs at least two repetitions.
+    """
+    scores: dict[tuple[str, str], dict[int, list[float]]] = {}
+    for result in results:
+        key = (result["variant"], result["model"])
+        repetitions = scores.setdefault(key, {})
+        repetitions.setdefault(result["repetition"], []).append(result["score"])
+
+    summary = []
+    for (variant, model), repetitions in scores.items():
+        means = [statistics.fmean(values) for values in repetitions.values()]
+        _, ci_low, ci_high = confidence_interval(means, confidence)
+        summary.append(
+            VariantScore(
+                variant,
+                model,
+                sum(len(values) for values in repetitions.values()),
+                statistics.fmean(
+                    score for values in repetitions.values() for score in values
+                ),
+                ci_low,
+                ci_high,
+            )
+        )
+    return sorted(summary, key=lambda score: score.mean, reverse=True)
+
+
+def run_sweep(
+    variants: dict[str, str],
+    models: list[str],
+    opponents: list[axl.Player],
+    turns: int,
+    repetitions: int = 1,
+    noise: float = 0,
+    prob_end: float | None = None,
+    seed: int | None = None,
+    workers: int = 8,
+    dedupe: bool = True,
+    on_result: Callable[[dict[str, Any]], None] | None = None,
+    completed: set[tuple[str, str, str, int]] | None = None,
+    **player_kwargs: Any,
+) -> list[dict[str, Any]]:
+    """
+    Plays a sweep and returns one result row per match.
+
+    Args:
+        variants: Prompt templates, keyed by variant name.
+        models: The models to play each variant with.
+        opponents: The strategies that each variant plays against.
+        turns: The number of turns per match (the maximum if `prob_end` is
+               given).
+        repetitions: The number of times each match is played.
+        noise: The probability that each intended move is flipped.
+        prob_end: The probability that each turn ends a match.
+        seed: A random seed. Repetition `r` of every match uses `seed + r`.
+        workers: The number of matches played at once.
+        dedupe: Whether players of the same repetition share responses to
+                identical requests.
+        on_result: Called with each result row as its match finishes.
+        completed: The (variant, model, opponent name, repetition) keys of
+                   matches that were already played, which are skipped.
+        **player_kwargs: Additional keyword arguments for every LLMPlayer.
+    """
+    prototypes = [opponent.clone() for opponent in opponents]
+    completed = completed or set()
+    matches = [
+        match
+        for match in plan_sweep(variants, models, opponents, repetitions)
+        if (
+            match.variant,
+            match.model,
+            prototypes[match.opponent].name,
+            match.repetition,
+        )
+        not in completed
+    ]
+
+    # One cache per repetition, so that repetitions don't reuse each other's
+    # sampled responses. Each is dropped once its repetition has finished.
+    remaining = Counter(match.repetition for match in matches)
+    response_caches = {
+        repetition: ResponseCache() if dedupe else None for repetition in remaining
+    }
+
+    def play(match: SweepMatch) -> dict[str, Any]:
+        player = LLMPlayer(
+            model=match.model,
+            prompt_template=variants[match.variant],
+            name=f"{match.variant} ({match.model})",
+            response_cache=response_caches[match.repetition],
+            **player_kwargs,
+        )
+        opponent = prototypes[match.opponent].clone()
+        # Every variant sees the same seed for a repetition, so differences
+        # between variants aren't down to different noise or match lengths.
+        match_seed = None if seed is None else seed + match.repetition
+        played = ConcurrentMatch(
+            (player, opponent),
+            turns=turns,
+            prob_end=prob_end,
+            noise=noise,
+            seed=match_seed,
+        )
+        played.play()
+        player.wait_for_streams()
+        return {
+            "variant": match.variant,
+            "model": match.model,
+            "opponent": opponent.name,
+            "repetition": match.repetition,
+            "score": played.final_score_per_turn()[0],
+            "opponent_score": played.final_score_per_turn()[1],
+        }
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(play, match): match for match in matches}
+        for future in as_completed(futures):
+            result = future.result()
+            repetition = futures[future].repetition
+            remaining[repetition] -= 1
+            if not remaining[repetition]:
+                del response_caches[repetition]
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
@@ -0,0 +1,258 @@
+import json
+import pathlib
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import axelrod as axl
+
+from batch_runner import BatchClient, BatchTournament, LiteLLMBatchClient
+from llm_player import DefaultResponse, LLMPlayer
+
+
+class LocalBatchServer(BatchClient):
+    """
+    A stand-in for a provider's batch API. Each batch completes after a
+    number of status checks, and every request is answered with `move`.
+    """
+
+    def __init__(self, move="C", polls_until_complete=2, status="completed"):
+        self.move = move
+        self.polls_until_complete = polls_until_complete
+        self.final_status = status
+        self.batches = {}
+        self.polls = {}
+
+    def submit(self, requests):
+        batch_id = f"batch-{len(self.batches)}"
+        self.batches[batch_id] = requests
+        self.polls[batch_id] = 0
+        return batch_id
+
+    def status(self, batch_id):
+        self.polls[batch_id] += 1
+        if self.polls[batch_id] < self.polls_until_complete:
+            return "in_progress"
+        return self.final_status
+
+    def results(self, batch_id):
+        return {
+            custom_id: json.dumps({"move": self.move, "rationale": "Batched."})
+            for custom_id in self.batches[batch_id]
+        }
+
+
+class TestBatchTournament(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.state_file = pathlib.Path(self.directory.name) / "state.json"
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_matches_advance_one_turn_per_batch(self):
+        """Test that all matches share one batch per turn."""
+        server = LocalBatchServer(move="C")
+        llm_player = LLMPlayer()
+        matches = [
+            (llm_player, axl.TitForTat(), 0),
+            (llm_player, axl.Defector(), 0),
+        ]
+        tournament = BatchTournament(
+            matches, server, self.state_file, turns=3, poll_interval=0
+        )
+        results = tournament.play()
+
+        # One batch per turn, each holding a request from both matches.
+        self.assertEqual(len(server.batches), 3)
+        for requests in server.batches.values():
+            self.assertEqual(len(requests), 2)
+
+        self.assertEqual(results[0]["player1_score"], 3)
+        self.assertEqual(results[1]["player1_score"], 0)
+        self.assertEqual(results[1]["player2_score"], 5)
+
+    def test_llm_vs_llm_match(self):
+        """Test that both sides of an LLM-vs-LLM match are batched."""
+        server = LocalBatchServer(move="D", polls_until_complete=1)
+        matches = [(LLMPlayer(name="A"), LLMPlayer(name="B"), 0)]
+        tournament = BatchTournament(
+            matches, server, self.state_file, turns=2, poll_interval=0
+        )
+        results = tournament.play()
+
+        self.assertEqual(len(server.batches["batch-0"]), 2)
+        self.assertEqual(results[0]["player1_score"], 1)
+
+    def test_state_is_saved_and_resumed(self):
+        """Test that a restarted run picks up its recorded moves and batch."""
+        server = LocalBatchServer(move="D", polls_until_complete=1)
+        matches = [(LLMPlayer(), axl.Grudger(), 0)]
+        first_run = BatchTournament(
+            matches, server, self.state_file, turns=4, poll_interval=0
+        )
+
+        # Stop the first run when its third batch is submitted.
+        submit = server.submit
+
+        def interrupt(requests):
+            if len(server.batches) == 2:
+                submit(requests)
+                raise KeyboardInterrupt
+            return submit(requests)
+
+        with patch.object(server, "submit", side_effect=interrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                first_run.play()
+
+        state = json.loads(self.state_file.read_text())
+        self.assertEqual(state["matches"][0]["moves"], ["DC", "DD"])
+
+        second_run = BatchTournament(
+            matches, server, self.state_file, turns=4, poll_interval=0
+        )
+        self.assertEqual(second_run.matches[0].moves(), ["DC", "DD"])
+        results = second_run.play()
+
+        # Grudger's grudge survives the restart, so it keeps defecting.
+        self.assertEqual(
+            second_run.matches[0].moves(), ["DC", "DD", "DD", "DD"]
+        )
+        self.assertEqual(results[0]["player1_score"], 2)
+
+    def test_batch_in_flight_is_resumed_with_fewer_matches(self):
+        """Test that a resumed run finds its results when matches are dropped."""
+        server = LocalBatchServer(move="C", polls_until_complete=1)
+        matches = [
+            (axl.Cooperator(), LLMPlayer(), 0),
+            (LLMPlayer(), axl.Defector(), 0),
+        ]
+        first_run = BatchTournament(
+            matches, server, self.state_file, turns=3, poll_interval=0
+        )
+
+        # Stop the first run while its second batch is in flight.
+        status = server.status
+
+        def interrupt(batch_id):
+            if batch_id == "batch-1":
+                raise KeyboardInterrupt
+            return status(batch_id)
+
+        with patch.object(server, "status", side_effect=interrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                first_run.play()
+
+        # The resumed run no longer holds the first match, as happens when
+        # it has finished and is left out of the plan.
+        second_run = BatchTournament(
+            matches[1:], server, self.state_file, turns=3, poll_interval=0
+        )
+        second_run.play()
+        self.assertEqual(len(server.batches), 3)
+        self.assertEqual(second_run.matches[0].moves(), ["CD", "CD", "CD"])
+
+    def test_failed_batch_raises_and_is_forgotten(self):
+        """Test that a failed batch stops the run and is resubmitted later."""
+        server = LocalBatchServer(status="expired", polls_until_complete=1)
+        matches = [(LLMPlayer(), axl.Cooperator(), 0)]
+        tournament = BatchTournament(
+            matches, server, self.state_file, turns=2, poll_interval=0
+        )
+        with self.assertRaises(RuntimeError):
+            tournament.play()
+
+        state = json.loads(self.state_file.read_text())
+        self.assertIsNone(state["batch_id"])
+
+    def test_results_are_reported_as_matches_finish(self):
+        """Test that `on_result` is called once per finished match."""
+        server = LocalBatchServer(polls_until_complete=1)
+        matches = [(LLMPlayer(), axl.Cooperator(), r) for r in range(3)]
+        tournament = BatchTournament(
+            matches, server, self.state_file, turns=2, poll_interval=0
+        )
+        reported = []
+        tournament.play(on_result=reported.append)
+        self.assertEqual([row["repetition"] for row in reported], [0, 1, 2])
+
+    def test_invalid_response_falls_back(self):
+        """Test that an unparseable batch result uses the fallback strategy."""
+
+        class BrokenServer(LocalBatchServer):
+            def results(self, batch_id):
+                return dict.fromkeys(self.batches[batch_id])
+
+        server = BrokenServer(polls_until_complete=1)
+        matches = [(LLMPlayer(), axl.Cooperator(), 0)]
+        tournament = BatchTournament(
+            matches, server, self.state_file, turns=2, poll_interval=0
+        )
+        tournament.play()
+        self.assertEqual(tournament.matches[0].moves(), ["CC", "DC"])
+
+
+class TestLiteLLMBatchClient(unittest.TestCase):
+    def test_request_body(self):
+        """Test conversion of completion arguments to a batch request body."""
+        client = LiteLLMBatchClient()
+        body = client._body(
+            {
+                "model": "openai/gpt-4o-mini",
+                "messages": [{"role": "user", "content": "Move?"}],
+                "response_model": DefaultResponse,
+                "api_key": "sk-test-key",
+                "temperature": 0,
+            }
+        )
+        self.assertEqual(body["model"], "gpt-4o-mini")
+        self.assertEqual(body["temperature"], 0)
+        self.assertNotIn("api_key", body)
+        self.assertEqual(
+            body["response_format"]["json_schema"]["schema"],
+            DefaultResponse.model_json_schema(),
+        )
+
+
+    @patch("batch_runner.litellm")
+    def test_results_read_error_file(self, litellm):
+        """Test that a batch whose requests all failed has no output file."""
+        error = {"custom_id": "a-0-0", "response": {"status_code": 400, "body": {}}}
+        litellm.retrieve_batch.return_value = SimpleNamespace(
+            output_file_id=None, error_file_id="file-errors"
+        )
+        litellm.file_content.return_value = SimpleNamespace(text=json.dumps(error))
+
+        self.assertEqual(LiteLLMBatchClient().results("batch-0"), {"a-0-0": None})
+        self.assertEqual(
+            litellm.file_content.call_args.kwargs["file_id"], "file-errors"
+        )
+
+    @patch("batch_runner.litellm")
+    def test_results_merge_output_and_error_files(self, litellm):
+        """Test that answered and failed requests are both reported."""
+        answered = {
+            "custom_id": "a-0-0",
+            "response": {
+                "status_code": 200,
+                "body": {"choices": [{"message": {"content": '{"move": "C"}'}}]},
+            },
+        }
+        failed = {"custom_id": "b-0-0", "error": {"message": "Rate limited."}}
+        files = {"file-out": answered, "file-errors": failed}
+        litellm.retrieve_batch.return_value = SimpleNamespace(
+            output_file_id="file-out", error_file_id="file-errors"
+        )
+        litellm.file_content.side_effect = lambda file_id, **kwargs: SimpleNamespace(
+            text=json.dumps(files[file_id])
+        )
+
+        self.assertEqual(
+            LiteLLMBatchClient().results("batch-0"),
+            {"a-0-0": '{"move": "C"}', "b-0-0": None},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import threading
+import time
+import unittest
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.pool import ThreadPool
+from unittest.mock import patch
+
+import axelrod as axl
+
+import concurrency
+from concurrency import (
+    ConcurrentMatch,
+    imap_within_limits,
+    interleave,
+    provider_of,
+    provider_slot,
+    set_provider_limits,
+)
+from llm_player import DefaultResponse, LLMPlayer
+
+
+class TestConcurrentMatch(unittest.TestCase):
+    @patch("llm_player.litellm.completion")
+    def test_llm_players_move_concurrently(self, mock_completion):
+        """Test that both LLM players' calls for a turn are in flight at once."""
+        # Each call waits for the other, so this only passes if they overlap.
+        barrier = threading.Barrier(2, timeout=5)
+
+        def completion(**kwargs):
+            barrier.wait()
+            return DefaultResponse(move="C")
+
+        mock_completion.side_effect = completion
+        players = (LLMPlayer(name="A"), LLMPlayer(name="B"))
+        match = ConcurrentMatch(players, turns=3)
+
+        self.assertEqual(match.play(), [(axl.Action.C, axl.Action.C)] * 3)
+        self.assertEqual(mock_completion.call_count, 6)
+
+    def test_other_matches_play_as_usual(self):
+        """Test that matches without two slow players match axl.Match."""
+        players = (axl.TitForTat(), axl.Alternator())
+        expected = axl.Match(players, turns=5).play()
+        self.assertEqual(ConcurrentMatch(players, turns=5).play(), expected)
+
+    @patch("llm_player.litellm.completion")
+    def test_noise_is_applied(self, mock_completion):
+        """Test that noise flips moves as in axl.Match."""
+        mock_completion.return_value = DefaultResponse(move="C")
+        players = (LLMPlayer(name="A"), LLMPlayer(name="B"))
+        match = ConcurrentMatch(players, turns=20, noise=0.5, seed=1)
+        self.assertIn(axl.Action.D, [move for turn in match.play() for move in turn])
+
+
+class TestProviderLimits(unittest.TestCase):
+    def tearDown(self):
+        set_provider_limits({})
+
+    def test_provider_of(self):
+        """Test that models are mapped to their providers."""
+        self.assertEqual(provider_of("gemini/gemini-2.5-flash-lite"), "gemini")
+        self.assertEqual(provider_of("gpt-4o-mini"), "openai")
+
+    def test_provider_slot_limits_requests_in_flight(self):
+        """Test that no more than the limit of requests run at once."""
+        set_provider_limits({"openai": 2})
+        lock = threading.Lock()
+        in_flight = 0
+        peak = 0
+
+        def request(model):
+            nonlocal in_flight, peak
+            with provider_slot(model):
+                with lock:
+                    in_flight += 1
+                    peak = max(peak, in_flight)
+                time.sleep(0.02)
+                with lock:
+                    in_flight -= 1
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            list(executor.map(request, ["gpt-4o-mini"] * 12))
+        self.assertEqual(peak, 2)
+
+    def test_unlimited_provider_is_not_blocked(self):
+        """Test that providers without a limit don't wait."""
+        set_provider_limits({"openai": 1})
+        with provider_slot("gpt-4o-mini"):
+            with provider_slot("gemini/gemini-2.5-flash-lite"):
+                pass
+
+    def test_no_limits(self):
+        """Test that the slot is a no-op when no limits are set."""
+        self.assertEqual(concurrency._provider_semaphores, {})
+        with provider_slot("gpt-4o-mini"):
+            pass
+
+    def test_interleave(self):
+        """Test that units are dealt round-robin across their keys."""
+        units = ["a1", "a2", "a3", "b1", "c1", "b2"]
+        interleaved = interleave(units, lambda unit: unit[0])
+        self.assertEqual(interleaved, ["a1", "b1", "c1", "a2", "b2", "a3"])
+
+    def test_imap_within_limits(self):
+        """Test that items only start once their provider has a free slot."""
+        lock = threading.Lock()
+        in_flight = Counter()
+        peak = Counter()
+        started = []
+
+        def play(item):
+            with lock:
+                started.append(item)
+                in_flight[item[0]] += 1
+                peak[item[0]] = max(peak[item[0]], in_flight[item[0]])
+            time.sleep(0.02)
+            with lock:
+                in_flight[item[0]] -= 1
+            return item
+
+        items = ["a1", "a2", "a3", "b1", "b2"]
+        with ThreadPool(2) as pool:
+            results = list(
+                imap_within_limits(
+                    pool, play, items, lambda item: Counter(item[0]), {"a": 1}, 2
+                )
+            )
+
+        self.assertCountEqual(results, items)
+        self.assertEqual(peak["a"], 1)
+        # The second worker isn't left waiting behind the busy provider.
+        self.assertLess(started.index("b1"), started.index("a2"))
+
+    def test_imap_within_limits_oversized_item(self):
+        """Test that an item needing more than a provider's limit still runs."""
+        with ThreadPool(2) as pool:
+            results = list(
+                imap_within_limits(pool, str.upper, ["aa"], Counter, {"a": 1}, 2)
+            )
+        self.assertEqual(results, ["AA"])
+
+    def test_imap_within_limits_raises_errors(self):
+        """Test that an item's error is raised to the caller."""
+        with ThreadPool(2) as pool:
+            with self.assertRaises(ZeroDivisionError):
+                list(
+                    imap_within_limits(
+                        pool,
+                        lambda item: 1 / item,
+                        [1, 0],
+                        lambda item: Counter(),
+                        {},
+                        2,
+                    )
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import json
+import pathlib
+import subprocess
+import sys
+import unittest
+
+# Seconds that `import llm_player` may take on top of its unavoidable
+# dependencies (axelrod and pydantic), which are imported first.
+IMPORT_BUDGET = 0.5
+
+BENCHMARK = """
+import json
+import sys
+import time
+
+import axelrod
+import pydantic
+
+start = time.perf_counter()
+import llm_player
+elapsed = time.perf_counter() - start
+
+print(json.dumps({
+    "elapsed": elapsed,
+    "modules": [name for name in ("litellm", "openai") if name in sys.modules],
+}))
+"""
+
+# Imports the CLI entry points, which pull in the batch runner, planner and
+# concurrency helpers on top of llm_player.
+CLI_BENCHMARK = """
+import json
+import sys
+
+sys.path.insert(0, "examples")
+import run_sweep
+import run_tournament
+
+print(json.dumps({
+    "modules": [name for name in ("litellm", "openai") if name in sys.modules],
+}))
+"""
+
+
+def run_benchmark(benchmark):
+    completed = subprocess.run(
+        [sys.executable, "-c", benchmark],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=pathlib.Path(__file__).parent.parent,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+class TestImportTime(unittest.TestCase):
+    def test_import_stays_within_budget(self):
+        """Test that importing llm_player doesn't load the LLM client libraries."""
+        result = run_benchmark(BENCHMARK)
+        self.assertEqual(result["modules"], [])
+        self.assertLess(result["elapsed"], IMPORT_BUDGET)
+
+    def test_cli_imports_stay_lazy(self):
+        """Test that importing the CLI scripts doesn't load the LLM client libraries."""
+        result = run_benchmark(CLI_BENCHMARK)
+        self.assertEqual(result["modules"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
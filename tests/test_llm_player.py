@@ -1,13 +1,22 @@
 import io
 import logging
+import os
 import pathlib
+import threading
 import unittest
+from types import SimpleNamespace
 from unittest.mock import PropertyMock, patch
 
 import axelrod as axl
 from pydantic import BaseModel, Field
 
-from llm_player import DefaultResponse, LLMPlayer
+from llm_player import DefaultResponse, LLMPlayer, ResponseCache
+
+
+def stream_chunk(content):
+    """Returns an object shaped like a chunk of a streamed litellm response."""
+    delta = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
 
 
 class TestLLMPlayer(unittest.TestCase):
@@ -21,12 +30,35 @@ class TestLLMPlayer(unittest.TestCase):
         # Check that the default prompt is loaded
         self.assertIn("Iterated Prisoner's Dilemma", player.prompt_template)
 
+    def test_default_prompt_is_shared(self):
+        """Test that the default prompt is read once and shared by players."""
+        self.assertIs(LLMPlayer().prompt_template, LLMPlayer().prompt_template)
+
     def test_initialization_with_custom_args(self):
         """Test initialization with a custom model and other arguments."""
         player = LLMPlayer(model="gpt-4-turbo", name="CustomGPTPlayer")
         self.assertEqual(player.model, "gpt-4-turbo")
         self.assertEqual(player.name, "CustomGPTPlayer")
 
+    def test_clone_keeps_configuration(self):
+        """Test that a clone keeps the name and litellm keyword arguments."""
+        player = LLMPlayer(model="gpt-4o-mini", name="Mini", temperature=0)
+        player.update_history(axl.Action.C, axl.Action.C)
+        clone = player.clone()
+
+        self.assertEqual(clone.name, "Mini")
+        self.assertEqual(clone.model, "gpt-4o-mini")
+        self.assertEqual(clone.litellm_kwargs, {"temperature": 0})
+        self.assertEqual(len(clone.history), 0)
+
+    def test_initialization_adds_no_log_handlers(self):
+        """Test that creating players doesn't accumulate logging handlers."""
+        module_logger = logging.getLogger("llm_player")
+        handlers = list(module_logger.handlers)
+        for _ in range(5):
+            LLMPlayer()
+        self.assertEqual(module_logger.handlers, handlers)
+
     def test_invalid_move_field_raises_error(self):
         """Test that a ValueError is raised if the move_field is not in the model."""
         with self.assertRaises(ValueError):
@@ -119,7 +151,10 @@ class TestLLMPlayer(unittest.TestCase):
             mock_opponent_history.return_value = [axl.Action.D, axl.Action.C]
 
             expected_prompt = expected_template.format(
-                history="CD", opponent_history="DC"
+                history="CD",
+                opponent_history="DC",
+                turns_remaining="Unknown",
+                noise="0",
             )
             self.assertEqual(player._generate_prompt(opponent), expected_prompt)
 
@@ -145,7 +180,10 @@ class TestLLMPlayer(unittest.TestCase):
             mock_opponent_history.return_value = []
 
             expected_prompt = expected_template.format(
-                history="None", opponent_history="None"
+                history="None",
+                opponent_history="None",
+                turns_remaining="Unknown",
+                noise="0",
             )
             self.assertEqual(player._generate_prompt(opponent), expected_prompt)
 
@@ -171,6 +209,42 @@ class TestLLMPlayer(unittest.TestCase):
             expected_prompt = "Your history: C. Opponent: D. Your move?"
             self.assertEqual(player._generate_prompt(opponent), expected_prompt)
 
+    def test_prompt_includes_match_attributes(self):
+        """Test that the turns remaining and noise level reach the prompt."""
+        custom_prompt = "Turns left: {turns_remaining}. Noise: {noise}."
+        player = LLMPlayer(prompt_template=custom_prompt)
+        opponent = axl.Cooperator()
+
+        player.set_match_attributes(length=10, noise=0.05)
+        self.assertEqual(
+            player._generate_prompt(opponent), "Turns left: 10. Noise: 0.05."
+        )
+
+        player.update_history(axl.Action.C, axl.Action.C)
+        self.assertEqual(
+            player._generate_prompt(opponent), "Turns left: 9. Noise: 0.05."
+        )
+
+        # A probabilistic match end gives an unknown match length.
+        player.set_match_attributes(length=float("inf"), noise=0)
+        self.assertEqual(
+            player._generate_prompt(opponent), "Turns left: Unknown. Noise: 0."
+        )
+
+    def test_default_prompt_variables_are_in_suffix(self):
+        """Test that prompts differing in game state share the static rules."""
+        player = LLMPlayer()
+        opponent = axl.Cooperator()
+
+        player.set_match_attributes(length=10, noise=0)
+        first = player._generate_prompt(opponent)
+        player.set_match_attributes(length=200, noise=0.1)
+        player.update_history(axl.Action.D, axl.Action.C)
+        second = player._generate_prompt(opponent)
+
+        shared_prefix = os.path.commonprefix([first, second])
+        self.assertIn("## Current Game State", shared_prefix)
+
     def test_logging(self):
         """Test that LLM responses and errors are logged."""
         log_stream = io.StringIO()
@@ -225,6 +299,105 @@ class TestLLMPlayer(unittest.TestCase):
         _, kwargs = mock_completion.call_args
         self.assertEqual(kwargs.get("api_key"), api_key)
 
+    @patch("llm_player.litellm.completion")
+    def test_strategy_parses_raw_completion(self, mock_completion):
+        """Test that a raw completion with prose around the JSON is parsed."""
+        message = SimpleNamespace(
+            content='Sure! {"move": "Defect", "rationale": "They defected."}'
+        )
+        mock_completion.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=message)]
+        )
+
+        player = LLMPlayer()
+        opponent = axl.Cooperator()
+        self.assertEqual(player.strategy(opponent), axl.Action.D)
+
+    @patch("llm_player.litellm.completion")
+    def test_streaming_commits_move_early(self, mock_completion):
+        """Test that a streamed move is played before the response finishes."""
+        rationale_sent = threading.Event()
+
+        def stream(**kwargs):
+            yield stream_chunk('{"move": "D", ')
+            # The rest of the response only arrives once the move is played.
+            rationale_sent.wait(timeout=5)
+            yield stream_chunk('"rationale": "Testing streams."}')
+
+        mock_completion.side_effect = stream
+
+        log_stream = io.StringIO()
+        logger = logging.getLogger("llm_player_stream_test_logger")
+        logger.addHandler(logging.StreamHandler(log_stream))
+        logger.setLevel(logging.INFO)
+
+        player = LLMPlayer(stream=True, logger=logger)
+        self.assertEqual(player.strategy(axl.Cooperator()), axl.Action.D)
+        _, kwargs = mock_completion.call_args
+        self.assertTrue(kwargs.get("stream"))
+        self.assertEqual(player.timings, [])
+
+        rationale_sent.set()
+        player.wait_for_streams()
+        self.assertIn("Testing streams.", log_stream.getvalue())
+        [timing] = player.timings
+        self.assertEqual(timing["turn"], 0)
+        self.assertLessEqual(timing["time_to_move"], timing["total_time"])
+
+    @patch("llm_player.litellm.completion")
+    def test_streaming_without_move_field(self, mock_completion):
+        """Test that a stream without a JSON move is parsed once it ends."""
+        mock_completion.return_value = iter(
+            [stream_chunk("Def"), stream_chunk("ect.")]
+        )
+
+        player = LLMPlayer(stream=True)
+        self.assertEqual(player.strategy(axl.Defector()), axl.Action.D)
+        [timing] = player.timings
+        self.assertEqual(timing["time_to_move"], timing["total_time"])
+
+    @patch("llm_player.litellm.completion")
+    def test_timings_are_recorded(self, mock_completion):
+        """Test that unstreamed calls record their time to move."""
+        mock_completion.return_value = DefaultResponse(move="C")
+
+        player = LLMPlayer()
+        player.strategy(axl.Cooperator())
+        [timing] = player.timings
+        self.assertEqual(timing["time_to_move"], timing["total_time"])
+
+    @patch("llm_player.litellm.completion")
+    def test_response_cache_shares_identical_requests(self, mock_completion):
+        """Test that players sharing a cache send identical requests once."""
+        mock_completion.return_value = DefaultResponse(move="D")
+        cache = ResponseCache()
+        players = [LLMPlayer(response_cache=cache) for _ in range(3)]
+        other_model = LLMPlayer(model="gpt-4o-mini", response_cache=cache)
+
+        for player in [*players, other_model]:
+            self.assertEqual(player.strategy(axl.Cooperator()), axl.Action.D)
+        self.assertEqual(mock_completion.call_count, 2)
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        # Keys hold a digest of the request rather than the prompt itself.
+        for key in cache._responses:
+            self.assertLess(len(repr(key)), 200)
+
+    @patch("llm_player.litellm.completion")
+    def test_response_cache_does_not_keep_failures(self, mock_completion):
+        """Test that a failed call is retried by the next identical request."""
+        mock_completion.side_effect = [
+            Exception("LLM API is unavailable"),
+            DefaultResponse(move="D"),
+        ]
+        cache = ResponseCache()
+        self.assertEqual(
+            LLMPlayer(response_cache=cache).strategy(axl.Cooperator()),
+            axl.Action.C,
+        )
+        self.assertEqual(
+            LLMPlayer(response_cache=cache).strategy(axl.Cooperator()),
+            axl.Action.D,
+        )
 
     @patch("llm_player.litellm.completion")
     def test_fallback_on_invalid_llm_move(self, mock_completion):
@@ -0,0 +1,134 @@
+import json
+import unittest
+from types import SimpleNamespace
+
+import axelrod as axl
+from pydantic import BaseModel
+
+from llm_player import DefaultResponse
+from move_parsing import (
+    StreamingMoveParser,
+    move_from_response,
+    normalize_move,
+    parse_move,
+)
+
+C, D = axl.Action.C, axl.Action.D
+
+
+def completion_response(content):
+    """Returns an object shaped like a litellm completion response."""
+    message = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class TestNormalizeMove(unittest.TestCase):
+    def test_move_spellings(self):
+        """Test that the common spellings of each move are recognised."""
+        for value in ["C", "c", "Cooperate", "COOPERATE", " 'C' ", "**C**"]:
+            self.assertEqual(normalize_move(value), C, value)
+        for value in ["D", "d", "Defect", "defection", "D."]:
+            self.assertEqual(normalize_move(value), D, value)
+
+    def test_invalid_moves(self):
+        """Test that other values aren't taken as moves."""
+        for value in ["Invalid", "", "CD", None]:
+            self.assertIsNone(normalize_move(value), value)
+
+
+class TestParseMove(unittest.TestCase):
+    def test_valid_json(self):
+        """Test parsing of a response that follows the schema."""
+        text = json.dumps({"move": "D", "rationale": "Retaliate."})
+        self.assertEqual(parse_move(text, DefaultResponse), D)
+
+    def test_json_in_prose(self):
+        """Test parsing of a JSON object wrapped in prose and a code fence."""
+        text = 'Here is my move:\n```json\n{"move": "cooperate"}\n```\nGood luck!'
+        self.assertEqual(parse_move(text, DefaultResponse), C)
+
+    def test_move_field_without_json(self):
+        """Test parsing of a move field outside of valid JSON."""
+        self.assertEqual(parse_move("Move: Defect, because...", DefaultResponse), D)
+        self.assertEqual(parse_move('{"move": "C", "rationale": ', DefaultResponse), C)
+        self.assertEqual(parse_move("Thinking...\n- **Move**: D", DefaultResponse), D)
+        self.assertEqual(parse_move("**Move:** Defect", DefaultResponse), D)
+
+    def test_move_mentioned_in_prose(self):
+        """Test that moves mentioned in prose aren't taken as the move field."""
+        for text in [
+            "The opponent's last move: D. I will cooperate to rebuild trust.",
+            "Previous move = C. Now defect.",
+        ]:
+            self.assertIsNone(parse_move(text, DefaultResponse))
+
+    def test_conflicting_move_fields(self):
+        """Test that a response giving two different moves has no move."""
+        self.assertIsNone(parse_move("Move: C\nMove: D", DefaultResponse))
+        self.assertEqual(parse_move("Move: C\nmove = Cooperate", DefaultResponse), C)
+
+    def test_bare_move_word(self):
+        """Test that a reply of just a move word is recognised, but not prose."""
+        self.assertEqual(parse_move(" Cooperate.\n", DefaultResponse), C)
+        self.assertEqual(parse_move("**D**", DefaultResponse), D)
+        self.assertIsNone(parse_move("I will not cooperate.", DefaultResponse))
+        self.assertIsNone(
+            parse_move("Should I cooperate or defect?", DefaultResponse)
+        )
+
+    def test_custom_move_field(self):
+        """Test parsing with a custom response model and move field."""
+
+        class CustomMove(BaseModel):
+            action: str
+
+        text = '{"action": "Defect"}'
+        self.assertEqual(parse_move(text, CustomMove, "action"), D)
+
+    def test_no_move(self):
+        """Test that responses without a move give None."""
+        self.assertIsNone(parse_move(None, DefaultResponse))
+        self.assertIsNone(parse_move('{"move": "Invalid"}', DefaultResponse))
+        self.assertIsNone(parse_move("I'm not sure.", DefaultResponse))
+
+
+class TestMoveFromResponse(unittest.TestCase):
+    def test_response_model_instance(self):
+        """Test that a response model instance is read directly."""
+        response = DefaultResponse(move="Cooperate")
+        self.assertEqual(move_from_response(response, DefaultResponse), C)
+
+    def test_completion_response(self):
+        """Test that a raw completion response is parsed from its content."""
+        response = completion_response('{"move": "d", "rationale": "Test."}')
+        self.assertEqual(move_from_response(response, DefaultResponse), D)
+        self.assertIsNone(move_from_response(object(), DefaultResponse))
+
+
+class TestStreamingMoveParser(unittest.TestCase):
+    def test_move_is_found_before_the_stream_ends(self):
+        """Test that the move is returned as soon as its field is complete."""
+        parser = StreamingMoveParser(DefaultResponse)
+        chunks = ['{"mo', 've": "', "D", '", "rationale": "They', " defected.", '"}']
+        moves = [parser.feed(chunk) for chunk in chunks]
+        self.assertEqual(moves, [None, None, None, D, D, D])
+        self.assertEqual(parser.finish(), D)
+        self.assertEqual(parser.text, "".join(chunks))
+
+    def test_finish_parses_full_text(self):
+        """Test that responses without a JSON move field are parsed at the end."""
+        parser = StreamingMoveParser(DefaultResponse)
+        for chunk in ["Move", ": Def", "ect, this round."]:
+            self.assertIsNone(parser.feed(chunk))
+        self.assertEqual(parser.finish(), D)
+
+    def test_empty_chunks(self):
+        """Test that empty chunks, such as a final chunk, are ignored."""
+        parser = StreamingMoveParser(DefaultResponse)
+        self.assertIsNone(parser.feed(None))
+        self.assertIsNone(parser.feed(""))
+        self.assertIsNone(parser.finish())
+
+
+if __name__ == "__main__":
+    unittest.main()
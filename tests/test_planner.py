@@ -0,0 +1,144 @@
+import math
+import random
+import unittest
+
+import axelrod as axl
+
+from llm_player import LLMPlayer, litellm
+from planner import (
+    DEFAULT_OUTPUT_TOKENS,
+    cap_output_tokens,
+    estimate_player_usage,
+    plan_tournament,
+    select_within_budget,
+    summarize_plan,
+)
+
+
+class TestPlanner(unittest.TestCase):
+    def test_non_llm_player_makes_no_calls(self):
+        """Test that ordinary strategies are estimated to cost nothing."""
+        usage = estimate_player_usage(axl.TitForTat(), turns=10)
+        self.assertEqual(usage.llm_calls, 0)
+        self.assertEqual(usage.cost, 0)
+
+    def test_llm_player_usage(self):
+        """Test that an LLM player makes one call per turn with growing prompts."""
+        player = LLMPlayer(prompt_template="{history} {opponent_history}")
+        short = estimate_player_usage(player, turns=5)
+        long = estimate_player_usage(player, turns=50)
+
+        self.assertEqual(short.llm_calls, 5)
+        self.assertEqual(short.output_tokens, 5 * DEFAULT_OUTPUT_TOKENS)
+        self.assertGreater(short.cost, 0)
+        # Longer histories make each prompt longer, not just more numerous.
+        self.assertGreater(long.input_tokens / 50, short.input_tokens / 5)
+
+    def test_estimate_bounds_mixed_histories(self):
+        """Test that the estimate covers the prompts of matches with mixed moves."""
+        for template in (None, "{history} {opponent_history}"):
+            player = LLMPlayer(model="gpt-4o-mini", prompt_template=template)
+            turns = 60
+            estimate = estimate_player_usage(player, turns)
+
+            rng = random.Random(1)
+            probe, opponent = player.clone(), axl.Cooperator()
+            for p in (probe, opponent):
+                p.set_match_attributes(length=turns)
+            input_tokens = 0
+            for _ in range(turns):
+                prompt = probe._generate_prompt(opponent)
+                input_tokens += litellm.token_counter(
+                    model=player.model, messages=[{"role": "user", "content": prompt}]
+                )
+                move, opponent_move = rng.choice("CD"), rng.choice("CD")
+                probe.update_history(
+                    axl.Action.from_char(move), axl.Action.from_char(opponent_move)
+                )
+                opponent.update_history(
+                    axl.Action.from_char(opponent_move), axl.Action.from_char(move)
+                )
+            self.assertGreaterEqual(estimate.input_tokens, input_tokens)
+
+    def test_max_tokens_bounds_output(self):
+        """Test that a player's `max_tokens` is used as its output allowance."""
+        player = LLMPlayer(max_tokens=20)
+        usage = estimate_player_usage(player, turns=4)
+        self.assertEqual(usage.output_tokens, 80)
+
+    def test_unknown_model_raises_error(self):
+        """Test that a model without pricing can't be budgeted."""
+        player = LLMPlayer(model="not-a-provider/not-a-model")
+        with self.assertRaises(ValueError):
+            estimate_player_usage(player, turns=3)
+
+    def test_unknown_model_without_budget(self):
+        """Test that a model without pricing is planned at an unknown cost."""
+        player = LLMPlayer(model="not-a-provider/not-a-model")
+        strategies = [axl.Cooperator(), axl.Defector(), player]
+        units = plan_tournament(strategies, 3, 1, require_pricing=False)
+
+        self.assertEqual(units[0].key, ("Cooperator", "Defector", 0))
+        self.assertEqual(units[1].llm_calls, 3)
+        self.assertTrue(math.isnan(units[1].cost))
+        self.assertIn("unknown cost", summarize_plan(units))
+
+    def test_cap_output_tokens(self):
+        """Test that LLM players without `max_tokens` are capped."""
+        strategies = [
+            axl.Cooperator(),
+            LLMPlayer(name="Uncapped", temperature=0),
+            LLMPlayer(max_tokens=20),
+        ]
+        cooperator, uncapped, capped = cap_output_tokens(strategies, 100)
+
+        self.assertIs(cooperator, strategies[0])
+        self.assertEqual(uncapped.name, "Uncapped")
+        self.assertEqual(
+            uncapped.litellm_kwargs, {"temperature": 0, "max_tokens": 100}
+        )
+        self.assertEqual(capped.litellm_kwargs, {"max_tokens": 20})
+
+    def test_plan_orders_by_repetition_then_cost(self):
+        """Test that every pairing is planned once before any repeats."""
+        llm_player = LLMPlayer()
+        strategies = [axl.Cooperator(), llm_player, axl.Defector()]
+        units = plan_tournament(strategies, turns=5, repetitions=2)
+
+        self.assertEqual(len(units), 6)
+        self.assertEqual([u.repetition for u in units], [0, 0, 0, 1, 1, 1])
+        self.assertEqual(units[0].key, ("Cooperator", "Defector", 0))
+        self.assertEqual(units[0].cost, 0)
+        self.assertGreater(units[1].cost, 0)
+
+    def test_plan_skips_completed_units(self):
+        """Test that units already in the results file are not planned."""
+        strategies = [axl.Cooperator(), axl.Defector(), axl.TitForTat()]
+        completed = {("Cooperator", "Defector", 0)}
+        units = plan_tournament(strategies, 5, 1, completed=completed)
+        self.assertNotIn(("Cooperator", "Defector", 0), [u.key for u in units])
+        self.assertEqual(len(units), 2)
+
+    def test_select_within_budget(self):
+        """Test that scheduling stops at the first unit over the budget."""
+        strategies = [axl.Cooperator(), LLMPlayer(), axl.Defector()]
+        units = plan_tournament(strategies, turns=5, repetitions=1)
+
+        scheduled, deferred = select_within_budget(units, units[1].cost)
+        self.assertEqual(scheduled, units[:2])
+        self.assertEqual(deferred, units[2:])
+
+        scheduled, deferred = select_within_budget(units, None)
+        self.assertEqual(scheduled, units)
+        self.assertEqual(deferred, [])
+
+    def test_summarize_plan(self):
+        """Test the summary of a plan."""
+        units = plan_tournament([axl.Cooperator(), LLMPlayer()], 3, 1)
+        summary = summarize_plan(units)
+        self.assertIn("1 matches, 3 LLM calls", summary)
+        self.assertIn("estimated cost $", summary)
+
+
+if __name__ == "__main__":
+    unittest.main()
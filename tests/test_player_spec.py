@@ -0,0 +1,43 @@
+import pickle
+import unittest
+
+import axelrod as axl
+
+from llm_player import LLMPlayer
+from player_spec import PlayerSpec
+
+
+class TestPlayerSpec(unittest.TestCase):
+    def test_build_from_player(self):
+        """Test that a spec builds a fresh copy of the player it came from."""
+        player = LLMPlayer(model="gpt-4o-mini", name="Mini", temperature=0)
+        player.update_history(axl.Action.C, axl.Action.D)
+        spec = PlayerSpec.from_player(player)
+
+        built = spec.build()
+        self.assertIsInstance(built, LLMPlayer)
+        self.assertEqual(spec.name, "Mini")
+        self.assertEqual(built.name, "Mini")
+        self.assertEqual(built.model, "gpt-4o-mini")
+        self.assertEqual(built.litellm_kwargs, {"temperature": 0})
+        self.assertEqual(len(built.history), 0)
+
+    def test_built_players_share_the_prompt(self):
+        """Test that players built from one spec share its prompt template."""
+        spec = PlayerSpec.from_player(LLMPlayer(prompt_template="{history}"))
+        self.assertIs(spec.build().prompt_template, spec.build().prompt_template)
+
+    def test_axelrod_strategy(self):
+        """Test specs of parametrised axelrod strategies."""
+        spec = PlayerSpec.from_player(axl.GTFT(p=0.2))
+        self.assertEqual(spec.build(), axl.GTFT(p=0.2))
+
+    def test_spec_pickles_small(self):
+        """Test that a default LLM player's spec is cheap to send to a worker."""
+        spec = PlayerSpec.from_player(LLMPlayer())
+        self.assertLess(len(pickle.dumps(spec)), len(pickle.dumps(LLMPlayer())))
+        self.assertEqual(pickle.loads(pickle.dumps(spec)), spec)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import gc
+import itertools
+import math
+import unittest
+import weakref
+from unittest.mock import patch
+
+import axelrod as axl
+
+from llm_player import ResponseCache
+from sweep import confidence_interval, plan_sweep, run_sweep, summarize_sweep
+
+
+def mock_completion(model, messages, response_model, api_key, **kwargs):
+    """Cooperates for the 'nice' variant and defects otherwise."""
+    move = "C" if messages[0]["content"].startswith("Be nice") else "D"
+    return response_model(move=move, rationale="Mocked sweep response.")
+
+
+VARIANTS = {
+    "nice": "Be nice. {history} {opponent_history}",
+    "mean": "Be mean. {history} {opponent_history}",
+}
+
+
+class TestSweep(unittest.TestCase):
+    def test_plan_interleaves_variants(self):
+        """Test that matches alternate between variants within a repetition."""
+        opponents = [axl.Cooperator(), axl.Defector()]
+        matches = plan_sweep(VARIANTS, ["gpt-4o-mini"], opponents, repetitions=2)
+
+        self.assertEqual(len(matches), 8)
+        self.assertEqual([m.variant for m in matches], ["nice", "mean"] * 4)
+        self.assertEqual([m.repetition for m in matches], [0] * 4 + [1] * 4)
+
+    def test_confidence_interval(self):
+        """Test the mean and t confidence interval of a set of scores."""
+        mean, low, high = confidence_interval([1.0, 2.0, 3.0])
+        self.assertEqual(mean, 2.0)
+        self.assertAlmostEqual(high - mean, 2.4842, places=3)
+        self.assertAlmostEqual(mean - low, high - mean)
+
+        mean, low, high = confidence_interval([3.0])
+        self.assertEqual(mean, 3.0)
+        self.assertTrue(math.isnan(low) and math.isnan(high))
+
+    @patch("llm_player.litellm.completion", side_effect=mock_completion)
+    def test_run_sweep(self, completion):
+        """Test that a sweep scores each variant against every opponent."""
+        opponents = [axl.TitForTat(), axl.Cooperator()]
+        reported = []
+        results = run_sweep(
+            VARIANTS,
+            ["gpt-4o-mini"],
+            opponents,
+            turns=4,
+            repetitions=3,
+            workers=4,
+            on_result=reported.append,
+        )
+
+        self.assertEqual(len(results), 12)
+        self.assertCountEqual(results, reported)
+        summary = summarize_sweep(results)
+        self.assertEqual([score.variant for score in summary], ["mean", "nice"])
+        nice = summary[1]
+        self.assertEqual(nice.matches, 6)
+        self.assertEqual(nice.mean, 3.0)
+        self.assertLessEqual(nice.ci_low, nice.mean)
+
+    @patch("llm_player.litellm.completion", side_effect=mock_completion)
+    def test_completed_matches_are_skipped(self, completion):
+        """Test that matches already played are not played again."""
+        opponents = [axl.TitForTat(), axl.Cooperator()]
+        completed = {("nice", "gpt-4o-mini", "Tit For Tat", 0)}
+        results = run_sweep(
+            VARIANTS, ["gpt-4o-mini"], opponents, 2, 1, completed=completed
+        )
+        keys = {(r["variant"], r["opponent"], r["repetition"]) for r in results}
+        self.assertEqual(len(results), 3)
+        self.assertNotIn(("nice", "Tit For Tat", 0), keys)
+
+    def test_summary_interval_is_over_repetitions(self):
+        """Test that the interval is taken over the mean of each repetition."""
+        results = [
+            {"variant": "v", "model": "m", "repetition": r, "score": score}
+            for r, score in [(0, 1.0), (0, 3.0), (1, 3.0), (1, 5.0)]
+        ]
+        [score] = summarize_sweep(results)
+        self.assertEqual(score.matches, 4)
+        self.assertEqual(score.mean, 3.0)
+        self.assertEqual(
+            (score.ci_low, score.ci_high), confidence_interval([2.0, 4.0])[1:]
+        )
+
+    @patch("llm_player.litellm.completion", side_effect=mock_completion)
+    def test_identical_prompts_are_sent_once(self, completion):
+        """Test that identical rendered prompts share one LLM call."""
+        opponents = [axl.Cooperator(), axl.Cooperator()]
+        run_sweep({"nice": VARIANTS["nice"]}, ["gpt-4o-mini"], opponents, 3, 2)
+        # Every match of a repetition sees the same histories, so each turn
+        # is called once per repetition.
+        self.assertEqual(completion.call_count, 6)
+
+        completion.reset_mock()
+        run_sweep(
+            {"nice": VARIANTS["nice"]},
+            ["gpt-4o-mini"],
+            opponents,
+            3,
+            2,
+            dedupe=False,
+        )
+        self.assertEqual(completion.call_count, 12)
+
+    @patch("llm_player.litellm.completion", side_effect=mock_completion)
+    def test_finished_repetitions_release_their_cache(self, completion):
+        """Test that a repetition's cache is freed once its matches are done."""
+        caches = []
+
+        def make_cache():
+            cache = ResponseCache()
+            caches.append(weakref.ref(cache))
+            return cache
+
+        alive = []
+
+        def on_result(result):
+            gc.collect()
+            alive.append(
+                (result["repetition"], [cache() is not None for cache in caches])
+            )
+
+        with patch("sweep.ResponseCache", side_effect=make_cache):
+            run_sweep(
+                VARIANTS,
+                ["gpt-4o-mini"],
+                [axl.Cooperator()],
+                turns=2,
+                repetitions=2,
+                workers=1,
+                on_result=on_result,
+            )
+        # Once the second repetition reports, the first one's cache is gone.
+        self.assertEqual(alive[-1], (1, [False, False]))
+        self.assertEqual(alive[2], (1, [False, True]))
+
+    @patch("llm_player.litellm.completion")
+    def test_repetitions_sample_their_own_responses(self, completion):
+        """Test that repetitions don't reuse each other's responses."""
+        moves = itertools.cycle("CD")
+
+        def sample(model, messages, response_model, api_key, **kwargs):
+            return response_model(move=next(moves))
+
+        completion.side_effect = sample
+        results = run_sweep(
+            {"nice": VARIANTS["nice"]},
+            ["gpt-4o-mini"],
+            [axl.Cooperator()],
+            turns=1,
+            repetitions=2,
+            workers=1,
+        )
+        self.assertEqual(completion.call_count, 2)
+        self.assertCountEqual([r["score"] for r in results], [3.0, 5.0])
+
+
+if __name__ == "__main__":
+    unittest.main()